@@ -0,0 +1,73 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Generic, TypeVar
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+
+# Validators for conditional GETs. Routes cache the validators with the body, so a
+# cached entity answers both 304s and full responses without touching the database
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class Validated(BaseModel, Generic[M]):
+    body: M
+    etag: str
+    updated_at: datetime
+
+
+def weak_etag(public_id: str, updated_at: datetime, *extra: str) -> str:
+    # extra covers fields shown in the response that don't bump updated_at
+    raw = ":".join([public_id, updated_at.isoformat(), *extra])
+    return f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+
+def http_date(updated_at: datetime) -> str:
+    # Timestamps are stored in server local time, HTTP dates are GMT to the second
+    return format_datetime(
+        updated_at.astimezone(timezone.utc).replace(microsecond=0), usegmt=True
+    )
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, updated_at: datetime) -> bool:
+    # If-None-Match wins when both are sent, weak comparison ignores the W/ prefix
+    ifNoneMatch = request.headers.get("if-none-match")
+    if ifNoneMatch is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in ifNoneMatch.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    ifModifiedSince = request.headers.get("if-modified-since")
+    if ifModifiedSince is not None:
+        try:
+            since = parsedate_to_datetime(ifModifiedSince)
+        except (TypeError, ValueError):
+            return False
+        modified = updated_at.astimezone(timezone.utc).replace(microsecond=0)
+        return since.tzinfo is not None and modified <= since
+    return False
+
+
+def set_validators(response: Response, etag: str, updated_at: datetime):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(updated_at)
+
+
+def not_modified_response(etag: str, updated_at: datetime) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, updated_at)
+    return response
+
+
+def conditional_response(
+    request: Request, response: Response, validated: Validated[M]
+) -> M | Response:
+    if is_not_modified(request, validated.etag, validated.updated_at):
+        return not_modified_response(validated.etag, validated.updated_at)
+    set_validators(response, validated.etag, validated.updated_at)
+    return validated.body
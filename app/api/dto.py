@@ -1,16 +1,50 @@
-from typing import Any, Mapping
+from datetime import datetime
+from typing import Any, Generic, Literal, Mapping, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.db.models import (
     Artifact,
+    Comment,
+    Issue,
     IssuePriority,
     IssueStatus,
     Job,
     JobResultKind,
     JobState,
+    Project,
+    ProjectMonthlyStats,
+    User,
 )
 
+# Loader options for the relationships each DTO reads.
+# Queries feeding a DTO must use them, an AsyncSession can't lazy load and
+# loading per row would cost one round trip per relationship.
+# All of them are many-to-one, so they are joined into the same query
+jobReadOptions = (joinedload(Job.user), joinedload(Job.artifact))
+artifactReadOptions = (joinedload(Artifact.job),)
+projectReadOptions = (joinedload(Project.author),)
+issueReadOptions = (
+    joinedload(Issue.project),
+    joinedload(Issue.assigned),
+    joinedload(Issue.author),
+)
+commentReadOptions = (joinedload(Comment.author), joinedload(Comment.issue))
+# Comment lists repeat the same few authors, they are loaded once in a second query
+commentListOptions = (selectinload(Comment.author), joinedload(Comment.issue))
+
+T = TypeVar("T")
+
+# Most items a single bulk request can carry
+MAX_BULK_ITEMS = 500
+
+
+# Returned by list endpoints, next_cursor is None on the last page
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None
+
 
 class JobBasic(BaseModel):
     id: str
@@ -83,6 +117,18 @@ class UserRead(BaseModel):
     created_at: str
 
 
+def userReadFrom(userDB: User) -> UserRead:
+    return UserRead(
+        id=userDB.public_id,
+        email=userDB.email,
+        username=userDB.username,
+        full_name=userDB.name,
+        admin=userDB.admin,
+        disabled=userDB.disabled,
+        created_at=userDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
+    )
+
+
 class UserReport(JobBasic):
     pass
 
@@ -102,6 +148,22 @@ class ProjectEdit(ProjectRead):
     pass
 
 
+class ProjectStatsRead(BaseModel):
+    month: str  # 2025-10
+    created: int
+    closed: int
+    open: int
+
+
+def projectStatsReadFrom(statsDB: ProjectMonthlyStats) -> ProjectStatsRead:
+    return ProjectStatsRead(
+        month=f"{statsDB.month:%Y-%m}",
+        created=statsDB.created,
+        closed=statsDB.closed,
+        open=statsDB.open,
+    )
+
+
 class IssueCreate(BaseModel):
     project_id: str
     title: str
@@ -110,14 +172,15 @@ class IssueCreate(BaseModel):
     priority: IssuePriority
 
 
+# Keys are assigned by the server, edits can't change them
 class IssueEditIn(IssueCreate):
-    key: str
     status: IssueStatus
     author_id: str
 
 
 class IssueEditOut(IssueEditIn):
     id: str
+    key: str
     created_at: str
     updated_at: str
 
@@ -126,6 +189,57 @@ class IssueRead(IssueEditOut):
     pass
 
 
+# Query parameters of the issue lists, every filter is optional
+class IssueFilters(BaseModel):
+    project_id: str | None = None
+    status: IssueStatus | None = None
+    priority: IssuePriority | None = None
+    assignee_id: str | None = None
+    author_id: str | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    updated_after: datetime | None = None
+    updated_before: datetime | None = None
+    sort: Literal["updated_at", "created_at"] = "updated_at"
+    order: Literal["desc", "asc"] = "desc"
+
+
+# Items without an id create an issue, the others replace the fields of that issue
+class IssueBulkItem(IssueCreate):
+    id: str | None = None
+    status: IssueStatus = IssueStatus.OPEN
+
+
+class IssueBulkIn(BaseModel):
+    issues: list[IssueBulkItem] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+# One result per item in request order, only one of issue or error is set
+class IssueBulkResult(BaseModel):
+    issue: IssueRead | None = None
+    error: str | None = None
+
+
+class IssueBulkOut(BaseModel):
+    results: list[IssueBulkResult]
+
+
+def issueReadFrom(issueDB: Issue) -> IssueRead:
+    return IssueRead(
+        id=issueDB.public_id,
+        title=issueDB.title,
+        key=f"{issueDB.project.key}-{issueDB.key}",
+        description=issueDB.description,
+        project_id=issueDB.project.public_id,
+        assignee_id=issueDB.assigned.public_id,
+        author_id=issueDB.author.public_id,
+        priority=issueDB.priority,
+        status=issueDB.status,
+        created_at=issueDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
+        updated_at=issueDB.updated_at.strftime("%a %d %b %Y, %I:%M%p"),
+    )
+
+
 class CommentCreate(BaseModel):
     issue_id: str
     body: str
@@ -146,6 +260,31 @@ class CommentRead(CommentEditOut):
     pass
 
 
+class CommentBulkIn(BaseModel):
+    comments: list[CommentCreate] = Field(min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+# One result per comment in request order, only one of id or error is set
+class CommentBulkResult(BaseModel):
+    id: str | None = None
+    error: str | None = None
+
+
+class CommentBulkOut(BaseModel):
+    results: list[CommentBulkResult]
+
+
+def commentReadFrom(commentDB: Comment) -> CommentRead:
+    return CommentRead(
+        id=commentDB.public_id,
+        issue_id=commentDB.issue.public_id,
+        body=commentDB.body,
+        author_id=commentDB.author.public_id,
+        created_at=commentDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
+        updated_at=commentDB.updated_at.strftime("%a %d %b %Y, %I:%M%p"),
+    )
+
+
 class ArtifactRead(BaseModel):
     id: str
     url: str
@@ -0,0 +1,83 @@
+import base64
+import json
+from datetime import datetime
+from typing import Annotated, Any, Callable, Sequence
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from sqlalchemy import Select, literal, tuple_
+
+from .routes_common import apiMessages
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+
+class PageParams(BaseModel):
+    cursor: str | None = None
+    limit: int = DEFAULT_PAGE_LIMIT
+
+
+def page_params(
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=MAX_PAGE_LIMIT)] = DEFAULT_PAGE_LIMIT,
+) -> PageParams:
+    return PageParams(cursor=cursor, limit=limit)
+
+
+# Cursors are opaque to clients, they only hold the sort key and id of the last row sent
+# The key is created_at for most lists, datetimes are sent as iso strings
+def encode_cursor(key: Any, id: int) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+    raw = json.dumps([key, id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(
+    cursor: str, parse_key: Callable[[Any], Any] = datetime.fromisoformat
+) -> tuple[Any, int]:
+    try:
+        key, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return parse_key(key), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=apiMessages.invalid_cursor
+        )
+
+
+# Newest rows first by default. Comparing the (key, id) tuple lets postgres seek
+# straight into the matching composite index instead of skipping OFFSET rows
+def paginate(
+    query: Select,
+    key: Any,
+    id: Any,
+    page: PageParams,
+    parse_key: Callable[[Any], Any] = datetime.fromisoformat,
+    descending: bool = True,
+) -> Select:
+    if page.cursor:
+        cursorKey, cursorId = decode_cursor(page.cursor, parse_key)
+        # Bound with the types of the sort columns so both sides compare alike
+        cursor = tuple_(literal(cursorKey, key.type), literal(cursorId, id.type))
+        if descending:
+            query = query.where(tuple_(key, id) < cursor)
+        else:
+            query = query.where(tuple_(key, id) > cursor)
+    if descending:
+        query = query.order_by(key.desc(), id.desc())
+    else:
+        query = query.order_by(key.asc(), id.asc())
+    # One extra row tells if there is a next page without running a count
+    return query.limit(page.limit + 1)
+
+
+def split_page(
+    rows: Sequence[Any],
+    page: PageParams,
+    cursor_of: Callable[[Any], tuple[Any, int]] = lambda row: (row.created_at, row.id),
+) -> tuple[Sequence[Any], str | None]:
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[: page.limit]
+    return rows, encode_cursor(*cursor_of(rows[-1]))
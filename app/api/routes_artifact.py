@@ -3,40 +3,61 @@ from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 
+from app.core.entity_cache import cached_read
 from app.db.models import Artifact
 
-from .dto import ArtifactRead, artifactReadFrom
+from .dto import ArtifactRead, Page, artifactReadFrom, artifactReadOptions
+from .pagination import PageParams, page_params, paginate, split_page
 from .routes_common import *
 
 router = APIRouter(tags=["artifact"])
 
 
-@router.get("/artifacts/all", response_model=list[ArtifactRead])
+@router.get("/artifacts/all", response_model=Page[ArtifactRead])
 async def read_all_artifacts(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[ArtifactRead]:
-    artifactQuery = select(Artifact)
-    artifactsDB = session.execute(artifactQuery).scalars()
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[ArtifactRead]:
+    artifactQuery = paginate(
+        select(Artifact).options(*artifactReadOptions),
+        Artifact.created_at,
+        Artifact.id,
+        page,
+    )
+    artifactsDB, nextCursor = split_page(
+        (await session.execute(artifactQuery)).scalars().all(), page
+    )
     allArtifacts = []
     for artifact in artifactsDB:
         allArtifacts.append(artifactReadFrom(artifact))
 
-    return allArtifacts
+    return Page(items=allArtifacts, next_cursor=nextCursor)
 
 
 @router.get("/artifacts/{artifact_id}", response_model=ArtifactRead)
 async def read_artifact(
     artifact_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> ArtifactRead:
-    artifactQuery = select(Artifact).where(Artifact.public_id == artifact_id)
-    artifactDB = session.execute(artifactQuery).scalars().first()
-    if not artifactDB:
+    # Artifacts never change once written, so nothing invalidates them
+    async def load_artifact() -> ArtifactRead | None:
+        artifactQuery = (
+            select(Artifact)
+            .where(Artifact.public_id == artifact_id)
+            .options(*artifactReadOptions)
+        )
+        artifactDB = (await session.execute(artifactQuery)).scalars().first()
+        return artifactReadFrom(artifactDB) if artifactDB else None
+
+    artifactRead = await cached_read(
+        "artifact", artifact_id, ArtifactRead, load_artifact
+    )
+    if not artifactRead:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.artifact_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return artifactReadFrom(artifactDB)
+    return artifactRead
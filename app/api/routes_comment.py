@@ -1,11 +1,27 @@
-from typing import Annotated
+from typing import Annotated, Iterator
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy import insert, select, update
+from sqlalchemy.orm import joinedload
 
+from app.core.entity_cache import cached_read, invalidate
 from app.db.models import Comment, Issue, User
 
-from .dto import CommentCreate, CommentEditIn, CommentEditOut, CommentRead
+from .conditional import Validated, conditional_response, weak_etag
+from .dto import (
+    CommentBulkIn,
+    CommentBulkOut,
+    CommentBulkResult,
+    CommentCreate,
+    CommentEditIn,
+    CommentEditOut,
+    CommentRead,
+    Page,
+    commentListOptions,
+    commentReadFrom,
+    commentReadOptions,
+)
+from .pagination import PageParams, page_params, paginate, split_page
 from .routes_common import *
 
 router = APIRouter(tags=["comment"])
@@ -15,10 +31,10 @@ router = APIRouter(tags=["comment"])
 async def create_comment(
     createReq: CommentCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> CommentRead:
     issueQuery = select(Issue).where(Issue.public_id == createReq.issue_id)
-    issueDB = session.execute(issueQuery).scalars().first()
+    issueDB = (await session.execute(issueQuery)).scalars().first()
     if not issueDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -28,7 +44,7 @@ async def create_comment(
 
     newComment = Comment(body=createReq.body, author=current_user, issue=issueDB)
     session.add(newComment)
-    session.commit()
+    await session.commit()
 
     return CommentRead(
         id=newComment.public_id,
@@ -40,22 +56,104 @@ async def create_comment(
     )
 
 
-# TODO
-"""@router.get("/comment/mine", response_model=list[CommentRead])
+@router.post("/comment/bulk", response_model=CommentBulkOut)
+async def bulk_comments(
+    bulkReq: CommentBulkIn,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> CommentBulkOut:
+    # One query for the issues and one insert for every comment that has its issue
+    issueQuery = select(Issue.public_id, Issue.id).where(
+        Issue.public_id.in_({c.issue_id for c in bulkReq.comments})
+    )
+    issueIds = dict((await session.execute(issueQuery)).tuples().all())
+
+    rows = [
+        {"body": c.body, "author_id": current_user.id, "issue_id": issueIds[c.issue_id]}
+        for c in bulkReq.comments
+        if c.issue_id in issueIds
+    ]
+    newIds: Iterator[str] = iter([])
+    if rows:
+        insertQuery = insert(Comment).returning(
+            Comment.public_id, sort_by_parameter_order=True
+        )
+        newIds = iter((await session.execute(insertQuery, rows)).scalars().all())
+        await session.commit()
+
+    return CommentBulkOut(
+        results=[
+            (
+                CommentBulkResult(id=next(newIds))
+                if c.issue_id in issueIds
+                else CommentBulkResult(error=apiMessages.issue_not_found)
+            )
+            for c in bulkReq.comments
+        ]
+    )
+
+
+@router.get("/comment/mine", response_model=Page[CommentRead])
 async def read_user_comments(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[CommentRead]:
-    pass
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[CommentRead]:
+    commentQuery = paginate(
+        select(Comment)
+        .where(Comment.author_id == current_user.id)
+        .options(*commentListOptions),
+        Comment.created_at,
+        Comment.id,
+        page,
+    )
+    commentsDB, nextCursor = split_page(
+        (await session.execute(commentQuery)).scalars().all(), page
+    )
+
+    return Page(
+        items=[commentReadFrom(commentDB) for commentDB in commentsDB],
+        next_cursor=nextCursor,
+    )
 
 
-@router.get("/comment/issue/{issue_id}", response_model=list[CommentRead])
+@router.get("/comment/issue/{issue_id}", response_model=Page[CommentRead])
 async def read_issue_comments(
     issue_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[CommentRead]:
-    pass"""
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[CommentRead]:
+    # Oldest first so pages read as a conversation
+    commentQuery = paginate(
+        select(Comment)
+        .where(
+            Comment.issue_id
+            == select(Issue.id).where(Issue.public_id == issue_id).scalar_subquery()
+        )
+        .options(*commentListOptions),
+        Comment.created_at,
+        Comment.id,
+        page,
+        descending=False,
+    )
+    commentsDB, nextCursor = split_page(
+        (await session.execute(commentQuery)).scalars().all(), page
+    )
+    # Only an empty page needs to tell a missing issue from an issue without comments
+    if not commentsDB:
+        issueQuery = select(Issue.id).where(Issue.public_id == issue_id)
+        if not (await session.execute(issueQuery)).first():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=apiMessages.issue_not_found,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    return Page(
+        items=[commentReadFrom(commentDB) for commentDB in commentsDB],
+        next_cursor=nextCursor,
+    )
 
 
 @router.post("/comment/edit/{comment_id}", response_model=CommentEditOut)
@@ -63,19 +161,21 @@ async def edit_comment(
     comment_id: str,
     editReq: CommentEditIn,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> CommentEditOut:
-    commentQuery = select(Comment).where(Comment.public_id == comment_id)
-    commentDB = session.execute(commentQuery).scalars().first()
+    commentQuery = (
+        select(Comment)
+        .where(Comment.public_id == comment_id)
+        .options(joinedload(Comment.author))
+    )
+    commentDB = (await session.execute(commentQuery)).scalars().first()
     if not commentDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.comment_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
-    isAdminOrAuthor = (
-        current_user.admin or commentDB.author.public_id == current_user.public_id
-    )
+    isAdminOrAuthor = current_user.admin or commentDB.author_id == current_user.id
     if not isAdminOrAuthor:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -83,7 +183,7 @@ async def edit_comment(
             headers={"WWW-Authenticate": "Bearer"},
         )
     newIssueQuery = select(Issue).where(Issue.public_id == editReq.issue_id)
-    newIssueDB = session.execute(newIssueQuery).scalars().first()
+    newIssueDB = (await session.execute(newIssueQuery)).scalars().first()
     if not newIssueDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -93,7 +193,8 @@ async def edit_comment(
 
     commentDB.body = editReq.body
     commentDB.issue = newIssueDB
-    session.commit()
+    await session.commit()
+    await invalidate("comment", commentDB.public_id)
 
     return CommentEditOut(
         id=commentDB.public_id,
@@ -109,19 +210,17 @@ async def edit_comment(
 async def delete_comment(
     comment_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ):
     commentQuery = select(Comment).where(Comment.public_id == comment_id)
-    commentDB = session.execute(commentQuery).scalars().first()
+    commentDB = (await session.execute(commentQuery)).scalars().first()
     if not commentDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.comment_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
-    isAdminOrAuthor = (
-        current_user.admin or commentDB.author.public_id == current_user.public_id
-    )
+    isAdminOrAuthor = current_user.admin or commentDB.author_id == current_user.id
     if not isAdminOrAuthor:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -129,7 +228,8 @@ async def delete_comment(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    session.delete(commentDB)
+    await session.delete(commentDB)
+    await invalidate("comment", commentDB.public_id)
 
     return {"status": apiMessages.comment_deleted}
 
@@ -137,23 +237,33 @@ async def delete_comment(
 @router.get("/comment/{comment_id}", response_model=CommentRead)
 async def read_comment(
     comment_id: str,
+    request: Request,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> CommentRead:
-    commentQuery = select(Comment).where(Comment.public_id == comment_id)
-    commentDB = session.execute(commentQuery).scalars().first()
-    if not commentDB:
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> CommentRead | Response:
+    async def load_comment() -> Validated[CommentRead] | None:
+        commentQuery = (
+            select(Comment)
+            .where(Comment.public_id == comment_id)
+            .options(*commentReadOptions)
+        )
+        commentDB = (await session.execute(commentQuery)).scalars().first()
+        if not commentDB:
+            return None
+        return Validated(
+            body=commentReadFrom(commentDB),
+            etag=weak_etag(comment_id, commentDB.updated_at),
+            updated_at=commentDB.updated_at,
+        )
+
+    commentRead = await cached_read(
+        "comment", comment_id, Validated[CommentRead], load_comment
+    )
+    if not commentRead:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.comment_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
-
-    return CommentRead(
-        id=commentDB.public_id,
-        issue_id=commentDB.issue.public_id,
-        body=commentDB.body,
-        author_id=commentDB.author.public_id,
-        created_at=commentDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
-        updated_at=commentDB.updated_at.strftime("%a %d %b %Y, %I:%M%p"),
-    )
+    return conditional_response(request, response, commentRead)
@@ -1,15 +1,23 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Callable
 from typing import Annotated
 
 from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from sqlalchemy import select
-from sqlalchemy.orm import Session
-
-from app.core.security import Token, get_token_payload, verify_password
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.auth_cache import AuthPrincipal, get_principal, set_principal
+from app.core.errors import HashingBusyError
+from app.core.security import (
+    Token,
+    get_password_hash_async,
+    get_token_payload,
+    verify_password_async,
+)
 from app.db.models import User
-from app.db.session import create_session, engine
+from app.db.session import create_async_session
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -29,7 +37,9 @@ class Messages(BaseModel):
     project_not_found: str = "Project not found"
     project_deleted: str = "Project deleted"
     issuekey_exists: str = "Issue key already exists"
+    issuetitle_exists: str = "Issue title already exists"
     issue_not_found: str = "Issue not found"
+    issue_repeated: str = "Issue appears more than once in the batch"
     issue_deleted: str = "Issue deleted"
     assigned_not_found: str = "Issue assigned user not found"
     comment_not_found: str = "Comment not found"
@@ -37,8 +47,11 @@ class Messages(BaseModel):
     user_not_author: str = "Only the author can perform this operation"
     requires_idempotency_key: str = "Idempotency-Key header required"
     job_not_found: str = "Job not found"
+    job_stale: str = "Job stopped running without finishing"
     artifact_not_found: str = "Artifact not found"
     job_accepted: str = "Job accepted"
+    server_busy: str = "Server busy, try again later"
+    invalid_cursor: str = "Invalid cursor"
 
 
 apiMessages = Messages()
@@ -47,42 +60,82 @@ apiMessages = Messages()
 # Will return session at first time it's driven by fastapi
 # and it will call it again once the endpoint returns
 # Additionally, any other functions that has this as a dependency will share the same cached session
-def get_session() -> Generator[Session]:
-    session = create_session()
+# Relationships can't be lazy loaded on an AsyncSession, queries must load them with options
+async def get_session() -> AsyncGenerator[AsyncSession]:
+    session = create_async_session()
     try:
         yield session
     finally:
-        session.close()
+        await session.close()
+
 
+# FastAPI closes yield dependencies before a StreamingResponse body is sent,
+# so streaming endpoints get the factory and open their own session while streaming
+def get_session_maker() -> Callable[[], AsyncSession]:
+    return create_async_session
 
-def get_user(username: str, session: Session) -> User | None:
+
+async def get_user(username: str, session: AsyncSession) -> User | None:
     userQuery = select(User).where(User.username == username)
-    userDB = session.execute(userQuery).scalars().first()
+    userDB = (await session.execute(userQuery)).scalars().first()
     if not userDB:
         return None
     return userDB
 
 
-def get_user_from_id(id: str, session: Session) -> User | None:
+async def get_user_from_id(id: str, session: AsyncSession) -> User | None:
     userQuery = select(User).where(User.public_id == id)
-    userDB = session.execute(userQuery).scalars().first()
+    userDB = (await session.execute(userQuery)).scalars().first()
     if not userDB:
         return None
     return userDB
 
 
-def authenticate_user(username: str, password: str, session: Session) -> User | None:
-    userDB = get_user(username, session)
+def server_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=apiMessages.server_busy,
+        headers={"Retry-After": "1"},
+    )
+
+
+# Password hashing runs on a bounded pool, requests are rejected when it is full
+async def check_password(password: str, pass_hash: str) -> bool:
+    try:
+        return await verify_password_async(password, pass_hash)
+    except HashingBusyError:
+        raise server_busy_exception()
+
+
+async def hash_password(password: str) -> str:
+    try:
+        return await get_password_hash_async(password)
+    except HashingBusyError:
+        raise server_busy_exception()
+
+
+async def authenticate_user(
+    username: str, password: str, session: AsyncSession
+) -> User | None:
+    userDB = await get_user(username, session)
     if not userDB:
         return None
-    if not verify_password(password, userDB.pass_hash):
+    if not await check_password(password, userDB.pass_hash):
         return None
     return userDB
 
 
-def get_user_from_token(
+# Rebuilds the user from the cache and attaches it to the session without a query.
+# Only the cached columns are loaded, anything else would need a lazy load
+async def user_from_principal(principal: AuthPrincipal, session: AsyncSession) -> User:
+    userDB = User(**principal.model_dump())
+    make_transient_to_detached(userDB)
+    return await session.merge(userDB, load=False)
+
+
+async def get_user_from_token(
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -93,9 +146,25 @@ def get_user_from_token(
     if not payload:
         raise credentials_exception
     username = payload.get("sub")
-    user = get_user(username, session)
+    jti = payload.get("jti")
+    principal = await get_principal(username, jti)
+    if principal is not None:
+        return await user_from_principal(principal, session)
+
+    user = await get_user(username, session)
     if user is None:
         raise credentials_exception
+    await set_principal(
+        username,
+        jti,
+        AuthPrincipal(
+            id=user.id,
+            public_id=user.public_id,
+            username=user.username,
+            admin=user.admin,
+            disabled=user.disabled,
+        ),
+    )
     return user
 
 
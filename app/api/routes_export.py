@@ -0,0 +1,87 @@
+from collections.abc import AsyncGenerator, Callable
+from typing import Annotated, Any
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select, select
+
+from app.db.models import Artifact, Issue, Job, User
+
+from .dto import (
+    artifactReadFrom,
+    artifactReadOptions,
+    issueReadFrom,
+    issueReadOptions,
+    jobReadFrom,
+    jobReadOptions,
+    userReadFrom,
+)
+from .routes_common import *
+
+router = APIRouter(tags=["export"])
+
+# Rows fetched from the server side cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+
+# Rows are read from a server side cursor and written out one JSON line at a time,
+# so memory stays flat no matter how big the table is
+async def stream_ndjson(
+    query: Select,
+    toDTO: Callable[[Any], BaseModel],
+    sessionMaker: Callable[[], AsyncSession],
+) -> AsyncGenerator[str]:
+    async with sessionMaker() as session:
+        rows = await session.stream_scalars(
+            query.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        async for row in rows:
+            yield toDTO(row).model_dump_json() + "\n"
+
+
+def ndjson_response(
+    query: Select,
+    toDTO: Callable[[Any], BaseModel],
+    sessionMaker: Callable[[], AsyncSession],
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_ndjson(query, toDTO, sessionMaker), media_type="application/x-ndjson"
+    )
+
+
+@router.get("/export/users")
+async def export_users(
+    admin_user: Annotated[User, Depends(require_admin)],
+    sessionMaker: Annotated[Callable[[], AsyncSession], Depends(get_session_maker)],
+) -> StreamingResponse:
+    userQuery = select(User).order_by(User.id)
+    return ndjson_response(userQuery, userReadFrom, sessionMaker)
+
+
+@router.get("/export/issues")
+async def export_issues(
+    admin_user: Annotated[User, Depends(require_admin)],
+    sessionMaker: Annotated[Callable[[], AsyncSession], Depends(get_session_maker)],
+) -> StreamingResponse:
+    # Only many-to-one relationships can be joined with yield_per, which the DTO options are
+    issueQuery = select(Issue).options(*issueReadOptions).order_by(Issue.id)
+    return ndjson_response(issueQuery, issueReadFrom, sessionMaker)
+
+
+@router.get("/export/jobs")
+async def export_jobs(
+    admin_user: Annotated[User, Depends(require_admin)],
+    sessionMaker: Annotated[Callable[[], AsyncSession], Depends(get_session_maker)],
+) -> StreamingResponse:
+    jobQuery = select(Job).options(*jobReadOptions).order_by(Job.id)
+    return ndjson_response(jobQuery, jobReadFrom, sessionMaker)
+
+
+@router.get("/export/artifacts")
+async def export_artifacts(
+    admin_user: Annotated[User, Depends(require_admin)],
+    sessionMaker: Annotated[Callable[[], AsyncSession], Depends(get_session_maker)],
+) -> StreamingResponse:
+    artifactQuery = select(Artifact).options(*artifactReadOptions).order_by(Artifact.id)
+    return ndjson_response(artifactQuery, artifactReadFrom, sessionMaker)
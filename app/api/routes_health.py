@@ -1,13 +1,14 @@
-from fastapi import APIRouter
+from typing import Annotated
+
+from fastapi import APIRouter, Depends
 from sqlalchemy import text
 
-from app.db.session import engine
+from .routes_common import *
 
 router = APIRouter(tags=["health"])
 
 
 @router.get("/health")
-def health():
-    with engine.connect() as conn:
-        conn.execute(text("select 1"))
+async def health(session: Annotated[AsyncSession, Depends(get_session)]):
+    await session.execute(text("select 1"))
     return {"status": "ok"}
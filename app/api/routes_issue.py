@@ -1,26 +1,74 @@
 import typing
+from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import Integer, func, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import (
+    ColumnClause,
+    Float,
+    Select,
+    cast,
+    func,
+    literal_column,
+    select,
+    union,
+    update,
+)
 
-from app.db.models import Issue, IssueStatus, Project, User
+from app.core.entity_cache import cached_read, invalidate
+from app.db.models import Comment, Issue, IssuePriority, IssueStatus, Project, User
+from app.db.monthly_stats import (
+    IssueState,
+    issue_stats_updates,
+    issues_stats_updates,
+    month_start,
+)
 
-from .dto import IssueCreate, IssueEditIn, IssueEditOut, IssueRead
+from .conditional import Validated, conditional_response, weak_etag
+from .dto import (
+    IssueBulkIn,
+    IssueBulkOut,
+    IssueBulkResult,
+    IssueCreate,
+    IssueEditIn,
+    IssueEditOut,
+    IssueFilters,
+    IssueRead,
+    Page,
+    issueReadFrom,
+    issueReadOptions,
+)
+from .pagination import PageParams, page_params, paginate, split_page
 from .routes_common import *
 
 router = APIRouter(tags=["issue"])
 
 
+async def allocate_issue_keys(
+    session: AsyncSession, project_id: int, count: int = 1
+) -> range:
+    # Reserves count consecutive keys in one statement. The row lock taken by the
+    # update keeps concurrent creates in the project from getting the same keys
+    # until this transaction ends
+    allocateQuery = (
+        update(Project)
+        .where(Project.id == project_id)
+        .values(next_issue_number=Project.next_issue_number + count)
+        .returning(Project.next_issue_number)
+    )
+    nextNumber = (await session.execute(allocateQuery)).scalar_one()
+    return range(nextNumber - count, nextNumber)
+
+
 @router.post("/issue/create", response_model=IssueRead)
 async def create_issue(
     createReq: IssueCreate,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> IssueRead:
     author = current_user.username
     projectQuery = select(Project).where(Project.public_id == createReq.project_id)
-    projectDB = session.execute(projectQuery).scalars().first()
+    projectDB = (await session.execute(projectQuery)).scalars().first()
     if not projectDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -29,22 +77,14 @@ async def create_issue(
         )
 
     assignedQuery = select(User).where(User.public_id == createReq.assignee_id)
-    assignedUserDB = session.execute(assignedQuery).scalars().first()
+    assignedUserDB = (await session.execute(assignedQuery)).scalars().first()
     if not assignedUserDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.assigned_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
-    highestKeyQuery = select(func.max(Issue.key.cast(Integer))).where(
-        Issue.project_id == projectDB.id
-    )
-    highestKeyRow = session.execute(highestKeyQuery).first()
-
-    newKey = 1
-    # Added extra check to satisfy mypy index check
-    if highestKeyRow and highestKeyRow[0] is not None:
-        newKey = highestKeyRow[0] + 1
+    (newKey,) = await allocate_issue_keys(session, projectDB.id)
     newIssue = Issue(
         key=newKey,
         title=createReq.title,
@@ -56,7 +96,11 @@ async def create_issue(
         assigned=assignedUserDB,
     )
     session.add(newIssue)
-    session.commit()
+    for statsUpdate in issue_stats_updates(
+        None, (projectDB.id, newIssue.status), month_start(datetime.today())
+    ):
+        await session.execute(statsUpdate)
+    await session.commit()
 
     return IssueRead(
         id=newIssue.public_id,
@@ -73,13 +117,212 @@ async def create_issue(
     )
 
 
-# TODO
-"""@router.get("/issue/mine", response_model=list[IssueRead])
+@router.post("/issue/bulk", response_model=IssueBulkOut)
+async def bulk_issues(
+    bulkReq: IssueBulkIn,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> IssueBulkOut:
+    # Every lookup covers the whole batch in one query, keys are reserved in one
+    # block per project and the new issues are flushed as a single batched insert
+    items = bulkReq.issues
+    projectQuery = select(Project).where(
+        Project.public_id.in_({item.project_id for item in items})
+    )
+    projects = {p.public_id: p for p in (await session.execute(projectQuery)).scalars()}
+    assignedQuery = select(User).where(
+        User.public_id.in_({item.assignee_id for item in items})
+    )
+    users = {u.public_id: u for u in (await session.execute(assignedQuery)).scalars()}
+    issues: dict[str, Issue] = {}
+    updateIds = {item.id for item in items if item.id is not None}
+    if updateIds:
+        issueQuery = (
+            select(Issue)
+            .options(*issueReadOptions)
+            .where(Issue.public_id.in_(updateIds))
+        )
+        issues = {i.public_id: i for i in (await session.execute(issueQuery)).scalars()}
+    titleQuery = select(Issue.title, Issue.public_id).where(
+        Issue.title.in_({item.title for item in items})
+    )
+    titles = dict((await session.execute(titleQuery)).tuples().all())
+
+    errors: list[str | None] = []
+    # Titles and issues taken by earlier items of the batch. An issue edited twice
+    # would count its stats change and allocate its new key twice
+    claimed: set[str] = set()
+    edited: set[str] = set()
+    for item in items:
+        error = None
+        if item.project_id not in projects:
+            error = apiMessages.project_not_found
+        elif item.assignee_id not in users:
+            error = apiMessages.assigned_not_found
+        elif item.id is not None and item.id not in issues:
+            error = apiMessages.issue_not_found
+        elif item.id is not None and item.id in edited:
+            error = apiMessages.issue_repeated
+        elif item.title in claimed or titles.get(item.title, item.id) != item.id:
+            error = apiMessages.issuetitle_exists
+        else:
+            claimed.add(item.title)
+            if item.id is not None:
+                edited.add(item.id)
+        errors.append(error)
+
+    keyCounts: dict[int, int] = {}
+    for item, error in zip(items, errors):
+        projectDB = projects.get(item.project_id)
+        if error is None and projectDB is not None:
+            issueDB = issues.get(item.id) if item.id is not None else None
+            if issueDB is None or issueDB.project_id != projectDB.id:
+                keyCounts[projectDB.id] = keyCounts.get(projectDB.id, 0) + 1
+    keys = {
+        projectId: iter(await allocate_issue_keys(session, projectId, count))
+        for projectId, count in keyCounts.items()
+    }
+
+    results: list[Issue | None] = []
+    statsChanges: list[tuple[IssueState, IssueState]] = []
+    for item, error in zip(items, errors):
+        if error is not None:
+            results.append(None)
+            continue
+        projectDB = projects[item.project_id]
+        if item.id is None:
+            issueDB = Issue(
+                key=next(keys[projectDB.id]),
+                title=item.title,
+                description=item.description,
+                status=item.status,
+                priority=item.priority,
+                project=projectDB,
+                author=current_user,
+                assigned=users[item.assignee_id],
+            )
+            session.add(issueDB)
+            statsChanges.append((None, (projectDB.id, issueDB.status)))
+        else:
+            issueDB = issues[item.id]
+            statsChanges.append(
+                (
+                    (issueDB.project_id, issueDB.status),
+                    (projectDB.id, item.status),
+                )
+            )
+            if issueDB.project_id != projectDB.id:
+                issueDB.key = next(keys[projectDB.id])
+            issueDB.title = item.title
+            issueDB.description = item.description
+            issueDB.status = item.status
+            issueDB.priority = item.priority
+            issueDB.project = projectDB
+            issueDB.assigned = users[item.assignee_id]
+        results.append(issueDB)
+
+    await session.flush()
+    for statsUpdate in issues_stats_updates(
+        statsChanges, month_start(datetime.today())
+    ):
+        await session.execute(statsUpdate)
+    await session.commit()
+    await invalidate("issue", *issues)
+
+    return IssueBulkOut(
+        results=[
+            (
+                IssueBulkResult(issue=issueReadFrom(issueDB))
+                if issueDB is not None
+                else IssueBulkResult(error=error)
+            )
+            for issueDB, error in zip(results, errors)
+        ]
+    )
+
+
+def filter_issues(query: Select, filters: IssueFilters) -> Select:
+    # Public ids are resolved in subqueries so filtering costs no extra round trip
+    if filters.project_id is not None:
+        query = query.where(
+            Issue.project_id
+            == select(Project.id)
+            .where(Project.public_id == filters.project_id)
+            .scalar_subquery()
+        )
+    if filters.assignee_id is not None:
+        query = query.where(
+            Issue.assign_id
+            == select(User.id)
+            .where(User.public_id == filters.assignee_id)
+            .scalar_subquery()
+        )
+    if filters.author_id is not None:
+        query = query.where(
+            Issue.author_id
+            == select(User.id)
+            .where(User.public_id == filters.author_id)
+            .scalar_subquery()
+        )
+    if filters.status is not None:
+        query = query.where(Issue.status == filters.status)
+    if filters.priority is not None:
+        query = query.where(Issue.priority == filters.priority)
+    if filters.created_after is not None:
+        query = query.where(Issue.created_at >= filters.created_after)
+    if filters.created_before is not None:
+        query = query.where(Issue.created_at < filters.created_before)
+    if filters.updated_after is not None:
+        query = query.where(Issue.updated_at >= filters.updated_after)
+    if filters.updated_before is not None:
+        query = query.where(Issue.updated_at < filters.updated_before)
+    return query
+
+
+async def list_issues(
+    session: AsyncSession, query: Select, filters: IssueFilters, page: PageParams
+) -> Page[IssueRead]:
+    sortKey = getattr(Issue, filters.sort)
+    issuesQuery = paginate(
+        filter_issues(query, filters).options(*issueReadOptions),
+        sortKey,
+        Issue.id,
+        page,
+        descending=filters.order == "desc",
+    )
+    issuesDB, nextCursor = split_page(
+        (await session.execute(issuesQuery)).scalars().all(),
+        page,
+        cursor_of=lambda issueDB: (getattr(issueDB, filters.sort), issueDB.id),
+    )
+
+    return Page(
+        items=[issueReadFrom(issueDB) for issueDB in issuesDB], next_cursor=nextCursor
+    )
+
+
+@router.get("/issue/list", response_model=Page[IssueRead])
+async def read_issues(
+    filters: Annotated[IssueFilters, Query()],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[IssueRead]:
+    return await list_issues(session, select(Issue), filters, page)
+
+
+# Same as /issue/list with the assignee set to the current user
+@router.get("/issue/mine", response_model=Page[IssueRead])
 async def read_user_issues(
+    filters: Annotated[IssueFilters, Query()],
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[IssueRead]:
-    pass"""
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[IssueRead]:
+    filters.assignee_id = None
+    return await list_issues(
+        session, select(Issue).where(Issue.assign_id == current_user.id), filters, page
+    )
 
 
 @router.post("/issue/edit/{issue_id}", response_model=IssueEditOut)
@@ -87,10 +330,10 @@ async def edit_issue(
     issue_id: str,
     editReq: IssueEditIn,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> IssueEditOut:
     newProjectQuery = select(Project).where(Project.public_id == editReq.project_id)
-    newProjectDB = session.execute(newProjectQuery).scalars().first()
+    newProjectDB = (await session.execute(newProjectQuery)).scalars().first()
     if not newProjectDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -98,7 +341,7 @@ async def edit_issue(
             headers={"WWW-Authenticate": "Bearer"},
         )
     newAuthorQuery = select(User).where(User.public_id == editReq.author_id)
-    newAuthorDb = session.execute(newAuthorQuery).scalars().first()
+    newAuthorDb = (await session.execute(newAuthorQuery)).scalars().first()
     if not newAuthorDb:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -106,7 +349,7 @@ async def edit_issue(
             headers={"WWW-Authenticate": "Bearer"},
         )
     newAssignedQuery = select(User).where(User.public_id == editReq.assignee_id)
-    newassignedDb = session.execute(newAssignedQuery).scalars().first()
+    newassignedDb = (await session.execute(newAssignedQuery)).scalars().first()
     if not newassignedDb:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -114,23 +357,35 @@ async def edit_issue(
             headers={"WWW-Authenticate": "Bearer"},
         )
     issueQuery = select(Issue).where(Issue.public_id == issue_id)
-    issueDB = session.execute(issueQuery).scalars().first()
+    issueDB = (await session.execute(issueQuery)).scalars().first()
     if not issueDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.issue_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Counters are updated in the same transaction as the issue
+    statsUpdates = issue_stats_updates(
+        (issueDB.project_id, issueDB.status),
+        (newProjectDB.id, editReq.status),
+        month_start(datetime.today()),
+    )
+    # Keys come from the project counter, an issue moved to another project gets
+    # the next key there
+    if newProjectDB.id != issueDB.project_id:
+        (issueDB.key,) = await allocate_issue_keys(session, newProjectDB.id)
     issueDB.title = editReq.title
-    issueDB.key = editReq.key
     issueDB.author = newAuthorDb
     issueDB.assigned = newassignedDb
     issueDB.description = editReq.description
     issueDB.status = editReq.status
     issueDB.priority = editReq.priority
     issueDB.project = newProjectDB
+    for statsUpdate in statsUpdates:
+        await session.execute(statsUpdate)
 
-    session.commit()
+    await session.commit()
+    await invalidate("issue", issueDB.public_id)
     return IssueEditOut(
         id=issueDB.public_id,
         title=issueDB.title,
@@ -151,7 +406,7 @@ async def edit_issue(
 async def resolve_issue(
     issue_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> IssueRead:
     pass"""
 
@@ -160,10 +415,10 @@ async def resolve_issue(
 async def delete_issue(
     issue_id: str,
     admin_user: Annotated[User, Depends(require_admin)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ):
     issueQuery = select(Issue).where(Issue.public_id == issue_id)
-    issueDB = session.execute(issueQuery).scalars().first()
+    issueDB = (await session.execute(issueQuery)).scalars().first()
     if not issueDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -171,37 +426,109 @@ async def delete_issue(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    session.delete(issueDB)
-    session.commit()
+    for statsUpdate in issue_stats_updates(
+        (issueDB.project_id, issueDB.status), None, month_start(datetime.today())
+    ):
+        await session.execute(statsUpdate)
+    await session.delete(issueDB)
+    await session.commit()
+    await invalidate("issue", issueDB.public_id)
 
     return {"status": apiMessages.issue_deleted}
 
 
+# Must match the configuration of the generated search_vector and the comments index,
+# inlined so postgres can use the indexes
+SEARCH_CONFIG: ColumnClause[str] = literal_column("'english'")
+
+
+@router.get("/issue/search", response_model=Page[IssueRead])
+async def search_issues(
+    q: Annotated[str, Query(min_length=1)],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+    project_id: str | None = None,
+    issue_status: Annotated[IssueStatus | None, Query(alias="status")] = None,
+    priority: IssuePriority | None = None,
+    assignee_id: str | None = None,
+    include_comments: bool = False,
+) -> Page[IssueRead]:
+    # websearch syntax: quoted phrases, "or" and -excluded words
+    tsQuery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    matches = Issue.search_vector.op("@@")(tsQuery)
+    if include_comments:
+        # A union keeps both sides on their GIN index, an OR with a subquery
+        # would scan every issue
+        commentMatches = select(Comment.issue_id).where(
+            func.to_tsvector(SEARCH_CONFIG, Comment.body).op("@@")(tsQuery)
+        )
+        matches = Issue.id.in_(union(select(Issue.id).where(matches), commentMatches))
+    # ts_rank_cd is a real, the cursor sends the rank back as a double. Ranking as a
+    # double keeps ties such as 0.4 equal to the cursor instead of skipping them
+    rank = cast(func.ts_rank_cd(Issue.search_vector, tsQuery), Float(53))
+
+    searchQuery = select(Issue, rank.label("rank")).where(matches)
+    if project_id is not None:
+        searchQuery = searchQuery.where(
+            Issue.project_id
+            == select(Project.id)
+            .where(Project.public_id == project_id)
+            .scalar_subquery()
+        )
+    if issue_status is not None:
+        searchQuery = searchQuery.where(Issue.status == issue_status)
+    if priority is not None:
+        searchQuery = searchQuery.where(Issue.priority == priority)
+    if assignee_id is not None:
+        searchQuery = searchQuery.where(
+            Issue.assign_id
+            == select(User.id).where(User.public_id == assignee_id).scalar_subquery()
+        )
+
+    # Best matches first, the cursor holds the rank and id of the last issue sent
+    searchQuery = paginate(
+        searchQuery.options(*issueReadOptions), rank, Issue.id, page, parse_key=float
+    )
+    rows, nextCursor = split_page(
+        (await session.execute(searchQuery)).all(),
+        page,
+        cursor_of=lambda row: (row.rank, row.Issue.id),
+    )
+
+    return Page(
+        items=[issueReadFrom(row.Issue) for row in rows], next_cursor=nextCursor
+    )
+
+
 @router.get("/issue/{issue_id}", response_model=IssueRead)
 async def read_issue(
     issue_id: str,
+    request: Request,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> IssueRead:
-    issueQuery = select(Issue).where(Issue.public_id == issue_id)
-    issueDB = session.execute(issueQuery).scalars().first()
-    if not issueDB:
+    session: Annotated[AsyncSession, Depends(get_session)],
+) -> IssueRead | Response:
+    async def load_issue() -> Validated[IssueRead] | None:
+        issueQuery = (
+            select(Issue).where(Issue.public_id == issue_id).options(*issueReadOptions)
+        )
+        issueDB = (await session.execute(issueQuery)).scalars().first()
+        if not issueDB:
+            return None
+        # The project key is part of the response but editing it doesn't touch the
+        # issue, changing it drops the cached issues instead
+        return Validated(
+            body=issueReadFrom(issueDB),
+            etag=weak_etag(issue_id, issueDB.updated_at, issueDB.project.key),
+            updated_at=issueDB.updated_at,
+        )
+
+    issueRead = await cached_read("issue", issue_id, Validated[IssueRead], load_issue)
+    if not issueRead:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.issue_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
-
-    return IssueRead(
-        id=issueDB.public_id,
-        title=issueDB.title,
-        key=f"{issueDB.project.key}-{issueDB.key}",
-        description=issueDB.description,
-        project_id=issueDB.project.public_id,
-        assignee_id=issueDB.assigned.public_id,
-        author_id=issueDB.author.public_id,
-        priority=issueDB.priority,
-        status=issueDB.status,
-        created_at=issueDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
-        updated_at=issueDB.updated_at.strftime("%a %d %b %Y, %I:%M%p"),
-    )
+    return conditional_response(request, response, issueRead)
@@ -1,53 +1,111 @@
+import asyncio
+from collections.abc import AsyncGenerator, Callable
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 
+from app.core.job_events import JobEvents
 from app.db.models import Job, JobResultKind, JobState
 
-from .dto import JobRead, jobReadFrom
+from .conditional import (
+    is_conditional,
+    is_not_modified,
+    not_modified_response,
+    set_validators,
+    weak_etag,
+)
+from .dto import JobRead, Page, jobReadFrom, jobReadOptions
+from .pagination import PageParams, page_params, paginate, split_page
 from .routes_common import *
 
 router = APIRouter(tags=["job"])
 
+# Longest a long-poll can hold a request, in seconds
+MAX_JOB_WAIT_SEC = 60
+# Comment lines sent on quiet event streams so proxies don't close them
+EVENTS_KEEPALIVE_SEC = 15
+UNFINISHED_STATES = (JobState.QUEUED, JobState.RUNNING)
 
-@router.get("/jobs/all", response_model=list[JobRead])
+
+async def wait_until_finished(session: AsyncSession, job_id: str, wait: float):
+    # Returns once the job leaves QUEUED/RUNNING, doesn't exist or wait runs out.
+    # Each wake up costs one narrow state lookup instead of a client poll
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    async with JobEvents(job_id) as events:
+        while True:
+            stateQuery = select(Job.state).where(Job.public_id == job_id)
+            state = (await session.execute(stateQuery)).scalar()
+            # Hands the connection back to the pool while waiting
+            await session.commit()
+            if state not in UNFINISHED_STATES:
+                return
+            remaining = deadline - loop.time()
+            if remaining <= 0 or not await events.wait(remaining):
+                return
+
+
+@router.get("/jobs/all", response_model=Page[JobRead])
 async def read_all_jobs(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[JobRead]:
-    jobQuery = select(Job)
-    jobsDB = session.execute(jobQuery).scalars()
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[JobRead]:
+    jobQuery = paginate(
+        select(Job).options(*jobReadOptions),
+        Job.created_at,
+        Job.id,
+        page,
+    )
+    jobsDB, nextCursor = split_page(
+        (await session.execute(jobQuery)).scalars().all(), page
+    )
     allJobs = []
     for job in jobsDB:
         allJobs.append(jobReadFrom(job))
 
-    return allJobs
+    return Page(items=allJobs, next_cursor=nextCursor)
 
 
-@router.get("/jobs/failed", response_model=list[JobRead])
+@router.get("/jobs/failed", response_model=Page[JobRead])
 async def read_failed_jobs(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[JobRead]:
-    jobQuery = select(Job).where(Job.state == JobState.FAILED)
-    jobsDB = session.execute(jobQuery).scalars()
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[JobRead]:
+    jobQuery = paginate(
+        select(Job).where(Job.state == JobState.FAILED).options(*jobReadOptions),
+        Job.created_at,
+        Job.id,
+        page,
+    )
+    jobsDB, nextCursor = split_page(
+        (await session.execute(jobQuery)).scalars().all(), page
+    )
     allJobs = []
     for job in jobsDB:
         allJobs.append(jobReadFrom(job))
 
-    return allJobs
+    return Page(items=allJobs, next_cursor=nextCursor)
 
 
 @router.get("/jobs/{job_id}/result")
 async def read_job_result(
     job_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
     response: Response,
+    wait: Annotated[int, Query(ge=0, le=MAX_JOB_WAIT_SEC)] = 0,
 ):
-    jobQuery = select(Job).where(Job.public_id == job_id)
-    jobDB = session.execute(jobQuery).scalars().first()
+    if wait:
+        await wait_until_finished(session, job_id, wait)
+    jobQuery = (
+        select(Job).where(Job.public_id == job_id).options(joinedload(Job.artifact))
+    )
+    jobDB = (await session.execute(jobQuery)).scalars().first()
     if not jobDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -70,18 +128,79 @@ async def read_job_result(
                 return {"artifact_url": jobDB.artifact.url}
 
 
+async def stream_job_events(
+    job_id: str, sessionMaker: Callable[[], AsyncSession]
+) -> AsyncGenerator[str]:
+    # Sends the job every time it changes and closes once it's finished
+    lastSent = None
+    async with JobEvents(job_id) as events:
+        while True:
+            async with sessionMaker() as session:
+                jobQuery = (
+                    select(Job).where(Job.public_id == job_id).options(*jobReadOptions)
+                )
+                jobDB = (await session.execute(jobQuery)).scalars().first()
+            if jobDB is None:
+                return
+            if jobDB.updated_at != lastSent:
+                lastSent = jobDB.updated_at
+                yield f"event: job\ndata: {jobReadFrom(jobDB).model_dump_json()}\n\n"
+            if jobDB.state not in UNFINISHED_STATES:
+                return
+            if not await events.wait(EVENTS_KEEPALIVE_SEC):
+                yield ": keepalive\n\n"
+
+
+@router.get("/jobs/{job_id}/events")
+async def read_job_events(
+    job_id: str,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    sessionMaker: Annotated[Callable[[], AsyncSession], Depends(get_session_maker)],
+) -> StreamingResponse:
+    jobQuery = select(Job.id).where(Job.public_id == job_id)
+    if not (await session.execute(jobQuery)).first():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=apiMessages.job_not_found,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return StreamingResponse(
+        stream_job_events(job_id, sessionMaker),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @router.get("/jobs/{job_id}", response_model=JobRead)
 async def read_job(
     job_id: str,
+    request: Request,
+    response: Response,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> JobRead:
-    jobQuery = select(Job).where(Job.public_id == job_id)
-    jobDB = session.execute(jobQuery).scalars().first()
+    session: Annotated[AsyncSession, Depends(get_session)],
+    wait: Annotated[int, Query(ge=0, le=MAX_JOB_WAIT_SEC)] = 0,
+) -> JobRead | Response:
+    # Long-poll, holds the request until the job is finished or wait seconds passed
+    if wait:
+        await wait_until_finished(session, job_id, wait)
+    # Pollers mostly get a 304 from this lookup without loading the job
+    if is_conditional(request):
+        updatedQuery = select(Job.updated_at).where(Job.public_id == job_id)
+        updatedAt = (await session.execute(updatedQuery)).scalar()
+        if updatedAt:
+            etag = weak_etag(job_id, updatedAt)
+            if is_not_modified(request, etag, updatedAt):
+                return not_modified_response(etag, updatedAt)
+
+    jobQuery = select(Job).where(Job.public_id == job_id).options(*jobReadOptions)
+    jobDB = (await session.execute(jobQuery)).scalars().first()
     if not jobDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.job_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
+    set_validators(response, weak_etag(job_id, jobDB.updated_at), jobDB.updated_at)
     return jobReadFrom(jobDB)
@@ -1,54 +1,36 @@
-from typing import Annotated
-
-from fastapi import APIRouter, Depends, Response
-from prometheus_client import generate_latest
-from sqlalchemy import func, select
+from fastapi import APIRouter, Response
 
+from app.core.job_counters import read_job_counts
 from app.core.metrics import (
     clear_jobs_gauges,
+    render_metrics,
     set_jobs_enqueued_gauge,
     set_jobs_failed_gauge,
     set_jobs_succeeded_gauge,
 )
-from app.db.models import Job, JobState
-
-from .routes_common import *
+from app.db.models import JobState
 
 router = APIRouter(tags=["metrics"])
 
 
 @router.get("/metrics")
-async def metrics(session: Annotated[Session, Depends(get_session)]):
-    succeededQuery = (
-        select(Job.job_type, func.count(Job.job_type))
-        .where(Job.state == JobState.SUCCEEDED)
-        .group_by(Job.job_type)
-    )
-    succeededDB = session.execute(succeededQuery).all()
-
-    queuedQuery = (
-        select(Job.job_type, func.count(Job.job_type))
-        .where(Job.state == JobState.QUEUED)
-        .group_by(Job.job_type)
-    )
-    queuedDB = session.execute(queuedQuery).all()
-
-    failedQuery = (
-        select(Job.job_type, func.count(Job.job_type))
-        .where(Job.state == JobState.FAILED)
-        .group_by(Job.job_type)
+async def metrics():
+    # Job counts are kept in redis by the job transitions, a scrape never queries the jobs table
+    counts = await read_job_counts(
+        [JobState.SUCCEEDED, JobState.QUEUED, JobState.FAILED]
     )
-    failedDB = session.execute(failedQuery).all()
 
-    clear_jobs_gauges()
+    # If redis can't be reached the gauges keep their last values
+    if counts is not None:
+        clear_jobs_gauges()
 
-    for job in succeededDB:
-        set_jobs_succeeded_gauge(job[0], job[1])
+        for jobType, count in counts[JobState.SUCCEEDED].items():
+            set_jobs_succeeded_gauge(jobType, count)
 
-    for job in queuedDB:
-        set_jobs_enqueued_gauge(job[0], job[1])
+        for jobType, count in counts[JobState.QUEUED].items():
+            set_jobs_enqueued_gauge(jobType, count)
 
-    for job in failedDB:
-        set_jobs_failed_gauge(job[0], job[1])
+        for jobType, count in counts[JobState.FAILED].items():
+            set_jobs_failed_gauge(jobType, count)
 
-    return Response(generate_latest(), media_type="text/plain")
+    return Response(render_metrics(), media_type="text/plain")
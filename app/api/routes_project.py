@@ -1,11 +1,21 @@
-from typing import Annotated
+from typing import Annotated, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import insert, select, update
 
-from app.db.models import Project, User
-
-from .dto import ProjectCreate, ProjectEdit, ProjectRead
+from app.core.entity_cache import cached_read, invalidate
+from app.db.models import Issue, Project, ProjectMonthlyStats, User
+
+from .dto import (
+    Page,
+    ProjectCreate,
+    ProjectEdit,
+    ProjectRead,
+    ProjectStatsRead,
+    projectReadOptions,
+    projectStatsReadFrom,
+)
+from .pagination import PageParams, page_params, paginate, split_page
 from .routes_common import *
 
 router = APIRouter(tags=["project"])
@@ -15,10 +25,13 @@ router = APIRouter(tags=["project"])
 async def create_project(
     createReq: ProjectCreate,
     admin_user: Annotated[User, Depends(require_admin)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> ProjectRead:
     author = admin_user.username
-    if any(project.key == createReq.key for project in admin_user.projects):
+    keyQuery = select(Project).where(
+        Project.user_id == admin_user.id, Project.key == createReq.key
+    )
+    if (await session.execute(keyQuery)).first():
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.projectkey_exists,
@@ -26,7 +39,7 @@ async def create_project(
         )
     newProject = Project(key=createReq.key, title=createReq.title, author=admin_user)
     session.add(newProject)
-    session.commit()
+    await session.commit()
 
     return ProjectRead(
         id=newProject.public_id,
@@ -41,9 +54,9 @@ async def create_project(
 async def edit_project(
     editReq: ProjectEdit,
     admin_user: Annotated[User, Depends(require_admin)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> ProjectRead:
-    newAuthorDb = get_user(editReq.author, session)
+    newAuthorDb = await get_user(editReq.author, session)
     if not newAuthorDb:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -51,18 +64,25 @@ async def edit_project(
             headers={"WWW-Authenticate": "Bearer"},
         )
     projectQuery = select(Project).where(Project.public_id == editReq.id)
-    projectDB = session.execute(projectQuery).scalars().first()
+    projectDB = (await session.execute(projectQuery)).scalars().first()
     if not projectDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.project_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # Cached issues show the project key, they are refreshed when it changes
+    staleIssues: Sequence[str] = []
+    if projectDB.key != editReq.key:
+        issueQuery = select(Issue.public_id).where(Issue.project_id == projectDB.id)
+        staleIssues = (await session.execute(issueQuery)).scalars().all()
     projectDB.title = editReq.title
     projectDB.key = editReq.key
     projectDB.author = newAuthorDb
 
-    session.commit()
+    await session.commit()
+    await invalidate("project", projectDB.public_id)
+    await invalidate("issue", *staleIssues)
     return ProjectRead(
         id=projectDB.public_id,
         title=projectDB.title,
@@ -72,13 +92,23 @@ async def edit_project(
     )
 
 
-@router.get("/project/mine", response_model=list[ProjectRead])
+@router.get("/project/mine", response_model=Page[ProjectRead])
 async def read_user_projects(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[ProjectRead]:
-    projectQuery = select(Project).where(Project.user_id == current_user.id)
-    projectsDB = session.execute(projectQuery).scalars()
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[ProjectRead]:
+    projectQuery = paginate(
+        select(Project)
+        .where(Project.user_id == current_user.id)
+        .options(*projectReadOptions),
+        Project.created_at,
+        Project.id,
+        page,
+    )
+    projectsDB, nextCursor = split_page(
+        (await session.execute(projectQuery)).scalars().all(), page
+    )
     myProjects = []
     for project in projectsDB:
         myProjects.append(
@@ -91,17 +121,17 @@ async def read_user_projects(
             )
         )
 
-    return myProjects
+    return Page(items=myProjects, next_cursor=nextCursor)
 
 
 @router.post("/project/delete/{project_id}")
 async def delete_project(
     project_id: str,
     admin_user: Annotated[User, Depends(require_admin)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ):
     projectQuery = select(Project).where(Project.public_id == project_id)
-    projectDB = session.execute(projectQuery).scalars().first()
+    projectDB = (await session.execute(projectQuery)).scalars().first()
     if not projectDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -109,31 +139,70 @@ async def delete_project(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    session.delete(projectDB)
-    session.commit()
+    await session.delete(projectDB)
+    await session.commit()
+    await invalidate("project", projectDB.public_id)
 
     return {"status": apiMessages.project_deleted}
 
 
+@router.get("/project/stats/{project_id}", response_model=list[ProjectStatsRead])
+async def read_project_stats(
+    project_id: str,
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    session: Annotated[AsyncSession, Depends(get_session)],
+    months: Annotated[int, Query(ge=1, le=120)] = 12,
+) -> list[ProjectStatsRead]:
+    # Reads the counters kept by the issue routes, months with no activity have no row
+    statsQuery = (
+        select(ProjectMonthlyStats)
+        .join(Project, Project.id == ProjectMonthlyStats.project_id)
+        .where(Project.public_id == project_id)
+        .order_by(ProjectMonthlyStats.month.desc())
+        .limit(months)
+    )
+    statsDB = (await session.execute(statsQuery)).scalars().all()
+    if not statsDB:
+        projectQuery = select(Project.id).where(Project.public_id == project_id)
+        if not (await session.execute(projectQuery)).first():
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=apiMessages.project_not_found,
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+
+    return [projectStatsReadFrom(monthDB) for monthDB in statsDB]
+
+
 @router.get("/project/{project_id}", response_model=ProjectRead)
 async def read_project(
     project_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> ProjectRead:
-    projectQuery = select(Project).where(Project.public_id == project_id)
-    projectDB = session.execute(projectQuery).scalars().first()
-    if not projectDB:
+    async def load_project() -> ProjectRead | None:
+        projectQuery = (
+            select(Project)
+            .where(Project.public_id == project_id)
+            .options(*projectReadOptions)
+        )
+        projectDB = (await session.execute(projectQuery)).scalars().first()
+        if not projectDB:
+            return None
+        return ProjectRead(
+            id=projectDB.public_id,
+            title=projectDB.title,
+            key=projectDB.key,
+            author=projectDB.author.username,
+            created_at=projectDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
+        )
+
+    projectRead = await cached_read("project", project_id, ProjectRead, load_project)
+    if not projectRead:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.project_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    return ProjectRead(
-        id=projectDB.public_id,
-        title=projectDB.title,
-        key=projectDB.key,
-        author=projectDB.author.username,
-        created_at=projectDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
-    )
+    return projectRead
@@ -1,29 +1,39 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
 from uuid import uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy import insert, select
+from sqlalchemy import and_, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
 
+from app.core.auth_cache import invalidate_user
+from app.core.config import settings
+from app.core.entity_cache import cached_read, invalidate
+from app.core.job_counters import job_state_changed_async
 from app.core.security import (
     Token,
     create_access_token,
     create_refresh_token,
-    get_password_hash,
     get_token_expiry,
 )
-from app.db.factory import create_job, create_request_hash
-from app.db.models import Job, JobState, RefreshToken, User
+from app.db.models import Artifact, Job, JobRequest, JobState, RefreshToken, User
+from app.db.monthly_report import report_fingerprint, report_inputs_query
+from app.db.monthly_stats import month_start
 from app.worker.tasks import generate_report
 
-from .dto import UserCreate, UserEdit, UserRead, UserReport
+from .dto import Page, UserCreate, UserEdit, UserRead, UserReport, userReadFrom
+from .pagination import PageParams, page_params, paginate, split_page
 from .routes_common import *
 
 router = APIRouter(tags=["user"])
 
+REPORT_JOB_TYPE = "generate-report"
+# A reused artifact url must stay valid long enough for the client to download it
+REUSED_URL_MIN_VALIDITY = timedelta(hours=1)
 
-def generate_new_token(userDB: User, session: Session) -> Token:
+
+async def generate_new_token(userDB: User, session: AsyncSession) -> Token:
     access_jti = uuid4().hex
     access_token = create_access_token(data={"sub": userDB.username}, jti=access_jti)
 
@@ -37,7 +47,7 @@ def generate_new_token(userDB: User, session: Session) -> Token:
         user=userDB,
     )
     session.add(tokenDB)
-    session.commit()
+    await session.commit()
 
     return Token(
         access_token=access_token, refresh_token=refresh_token, token_type="bearer"
@@ -45,18 +55,18 @@ def generate_new_token(userDB: User, session: Session) -> Token:
 
 
 @router.post("/user/create", response_model=UserRead)
-def create_user(
-    createReq: UserCreate, session: Annotated[Session, Depends(get_session)]
+async def create_user(
+    createReq: UserCreate, session: Annotated[AsyncSession, Depends(get_session)]
 ) -> UserRead:
     usernameQuery = select(User).where(User.username == createReq.username)
     emailQuery = select(User).where(User.email == createReq.email)
-    if session.execute(usernameQuery).all():
+    if (await session.execute(usernameQuery)).all():
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.username_exists,
             headers={"WWW-Authenticate": "Bearer"},
         )
-    if session.execute(emailQuery).all():
+    if (await session.execute(emailQuery)).all():
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.email_exists,
@@ -67,10 +77,10 @@ def create_user(
         username=createReq.username,
         email=createReq.email,
         name=createReq.full_name,
-        pass_hash=get_password_hash(createReq.password),
+        pass_hash=await hash_password(createReq.password),
     )
     session.add(newUser)
-    session.commit()
+    await session.commit()
 
     return UserRead(
         id=newUser.public_id,
@@ -86,20 +96,20 @@ def create_user(
 @router.post("/token", response_model=Token)
 async def login(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> Token:
-    userDB = authenticate_user(form_data.username, form_data.password, session)
+    userDB = await authenticate_user(form_data.username, form_data.password, session)
     if not userDB:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=apiMessages.login_fail
         )
 
-    return generate_new_token(userDB, session)
+    return await generate_new_token(userDB, session)
 
 
 @router.post("/refresh", response_model=Token)
 async def refresh(
-    token: str, session: Annotated[Session, Depends(get_session)]
+    token: str, session: Annotated[AsyncSession, Depends(get_session)]
 ) -> Token:
     payload = get_token_payload(token)
     if not payload:
@@ -110,7 +120,7 @@ async def refresh(
         )
     username = payload.get("sub")
     jti = payload.get("jti")
-    userDB = get_user(username, session)
+    userDB = await get_user(username, session)
     if not userDB:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -118,7 +128,7 @@ async def refresh(
         )
 
     refreshQuery = select(RefreshToken).where(RefreshToken.public_id == jti)
-    refreshDB = session.execute(refreshQuery).scalars().first()
+    refreshDB = (await session.execute(refreshQuery)).scalars().first()
     if not refreshDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -135,18 +145,18 @@ async def refresh(
         )
 
     refreshDB.revoked_at = datetime.now(timezone.utc)
-    session.commit()
+    await session.commit()
 
-    return generate_new_token(userDB, session)
+    return await generate_new_token(userDB, session)
 
 
 @router.post("/user/delete/{user_id}")
 async def delete_user(
     user_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ):
-    userDB = get_user_from_id(user_id, session)
+    userDB = await get_user_from_id(user_id, session)
     if not userDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -154,8 +164,10 @@ async def delete_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    session.delete(userDB)
-    session.commit()
+    await session.delete(userDB)
+    await session.commit()
+    await invalidate_user(userDB.username)
+    await invalidate("user", userDB.public_id)
 
     return {"status": apiMessages.user_deleted}
 
@@ -164,10 +176,10 @@ async def delete_user(
 async def edit_user(
     editReq: UserEdit,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> UserRead:
     userQuery = select(User).where(User.public_id == editReq.id)
-    userDB = session.execute(userQuery).scalars().first()
+    userDB = (await session.execute(userQuery)).scalars().first()
     if not userDB:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -176,10 +188,12 @@ async def edit_user(
         )
     userDB.email = editReq.email
     userDB.name = editReq.full_name if editReq.full_name is not None else ""
-    userDB.pass_hash = get_password_hash(editReq.password)
+    userDB.pass_hash = await hash_password(editReq.password)
     userDB.disabled = editReq.disabled
     userDB.admin = editReq.admin
-    session.commit()
+    await session.commit()
+    await invalidate_user(userDB.username)
+    await invalidate("user", userDB.public_id)
 
     return UserRead(
         id=userDB.public_id,
@@ -192,14 +206,17 @@ async def edit_user(
     )
 
 
-@router.get("/user/all", response_model=list[UserRead])
+@router.get("/user/all", response_model=Page[UserRead])
 async def read_all_users(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
-) -> list[UserRead]:
+    session: Annotated[AsyncSession, Depends(get_session)],
+    page: Annotated[PageParams, Depends(page_params)],
+) -> Page[UserRead]:
 
-    userQuery = select(User)
-    userDB = session.execute(userQuery).scalars()
+    userQuery = paginate(select(User), User.created_at, User.id, page)
+    userDB, nextCursor = split_page(
+        (await session.execute(userQuery)).scalars().all(), page
+    )
 
     result = []
     for user in userDB:
@@ -215,38 +232,164 @@ async def read_all_users(
             )
         )
 
-    return result
+    return Page(items=result, next_cursor=nextCursor)
+
+
+async def find_reusable_job(
+    session: AsyncSession, user_pk: int, job_type: str, request_hash: str
+) -> Job | None:
+    # Unfinished jobs are attached to while their worker is alive, succeeded ones are
+    # reused while the artifact lives
+    reusableQuery = (
+        select(Job)
+        .outerjoin(Job.artifact)
+        .where(
+            Job.user_id == user_pk,
+            Job.job_type == job_type,
+            Job.request_hash == request_hash,
+            or_(
+                Job.state == JobState.QUEUED,
+                and_(Job.state == JobState.RUNNING, Job.updated_at > stale_cutoff()),
+                and_(
+                    Job.state == JobState.SUCCEEDED,
+                    Artifact.expires_at > datetime.now() + REUSED_URL_MIN_VALIDITY,
+                ),
+            ),
+        )
+        .order_by(Job.id.desc())
+        .limit(1)
+    )
+    return (await session.execute(reusableQuery)).scalars().first()
+
+
+def stale_cutoff() -> datetime:
+    # A task outliving the visibility timeout has already been delivered again, a job
+    # still running after it lost its worker
+    return datetime.now() - timedelta(seconds=settings.worker.visibility_timeout)
+
+
+async def fail_stale_jobs(
+    session: AsyncSession, user_pk: int, job_type: str, request_hash: str
+) -> int:
+    # Frees the unfinished slot a lost worker would otherwise hold for good
+    staleQuery = (
+        update(Job)
+        .where(
+            Job.user_id == user_pk,
+            Job.job_type == job_type,
+            Job.request_hash == request_hash,
+            Job.state == JobState.RUNNING,
+            Job.updated_at <= stale_cutoff(),
+        )
+        .values(
+            state=JobState.FAILED,
+            last_error=apiMessages.job_stale,
+            error_kind="StaleJob",
+            finished_at=datetime.now(),
+        )
+        .returning(Job.id)
+    )
+    return len((await session.execute(staleQuery)).scalars().all())
+
+
+async def queue_report_job(
+    session: AsyncSession, userDB: User, idem_key: str, request_hash: str
+) -> Job | None:
+    # Returns None when an unfinished job for the same input already exists
+    staleCount = await fail_stale_jobs(
+        session, userDB.id, REPORT_JOB_TYPE, request_hash
+    )
+    queueQuery = (
+        insert(Job)
+        .values(
+            user_id=userDB.id,
+            job_type=REPORT_JOB_TYPE,
+            state=JobState.QUEUED,
+            idempotency_key=idem_key,
+            request_hash=request_hash,
+        )
+        .on_conflict_do_nothing(
+            index_elements=[Job.user_id, Job.job_type, Job.request_hash],
+            # Spelled as in the index, Postgres only matches a partial index against a
+            # constant predicate and a bound one breaks once the statement is prepared
+            index_where=text("state IN ('QUEUED', 'RUNNING')"),
+        )
+        .returning(Job)
+    )
+    jobDB = (await session.execute(queueQuery)).scalars().first()
+    await session.commit()
+    for _ in range(staleCount):
+        await job_state_changed_async(
+            REPORT_JOB_TYPE, JobState.RUNNING, JobState.FAILED
+        )
+    if jobDB:
+        await job_state_changed_async(jobDB.job_type, None, jobDB.state)
+        generate_report.apply_async(
+            args=[jobDB.public_id, userDB.public_id], queue="pdfs"
+        )
+    return jobDB
+
+
+async def find_requested_job(
+    session: AsyncSession, user_pk: int, idem_key: str
+) -> Job | None:
+    requestedQuery = (
+        select(Job)
+        .join(JobRequest, JobRequest.job_id == Job.id)
+        .where(JobRequest.user_id == user_pk, JobRequest.idempotency_key == idem_key)
+    )
+    return (await session.execute(requestedQuery)).scalars().first()
+
+
+async def remember_request(
+    session: AsyncSession, user_pk: int, idem_key: str, jobDB: Job
+) -> Job:
+    # Keys of requests that attached to a job are stored too, the job only holds the
+    # key it was created with
+    rememberQuery = (
+        insert(JobRequest)
+        .values(user_id=user_pk, idempotency_key=idem_key, job_id=jobDB.id)
+        .on_conflict_do_nothing(
+            index_elements=[JobRequest.user_id, JobRequest.idempotency_key]
+        )
+        .returning(JobRequest.job_id)
+    )
+    remembered = (await session.execute(rememberQuery)).scalars().first()
+    await session.commit()
+    if remembered is None:
+        # A concurrent request with the same key stored its job first
+        requestedDB = await find_requested_job(session, user_pk, idem_key)
+        if requestedDB:
+            return requestedDB
+    return jobDB
 
 
 @router.post("/user/report", response_model=UserReport)
 async def generate_report_job(
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
     idem_key: Annotated[str, Depends(require_idempotency_key)],
 ) -> UserReport:
 
-    request_hash = create_request_hash(None, None)
-
-    existingJobQuery = select(Job).where(
-        Job.user_id == current_user.id,
-        Job.idempotency_key == idem_key,
-        Job.request_hash == request_hash,
-    )
-    jobDB = session.execute(existingJobQuery).scalars().first()
+    # A retried request gets its job back even if the data changed since
+    jobDB = await find_requested_job(session, current_user.id, idem_key)
     if not jobDB:
-        jobDB = create_job(
-            current_user, job_type="generate-report", idempotency_key=idem_key
-        )
-
-        session.add(jobDB)
-        session.commit()
-        generate_report.apply_async(
-            args=[jobDB.public_id, jobDB.user.public_id], queue="pdfs"
-        )
+        inputs = (await session.execute(report_inputs_query(current_user.id))).all()
+        request_hash = report_fingerprint(month_start(datetime.today()), inputs)
+        # An insert that loses the race to an identical request finds its job next time
+        while not jobDB:
+            jobDB = await find_reusable_job(
+                session, current_user.id, REPORT_JOB_TYPE, request_hash
+            )
+            if not jobDB:
+                jobDB = await queue_report_job(
+                    session, current_user, idem_key, request_hash
+                )
+        jobDB = await remember_request(session, current_user.id, idem_key, jobDB)
 
     return UserReport(
         id=jobDB.public_id,
-        user_id=jobDB.user.public_id,
+        user_id=current_user.public_id,
         job_type=jobDB.job_type,
         status=jobDB.state,
     )
@@ -256,21 +399,17 @@ async def generate_report_job(
 async def read_user(
     user_id: str,
     current_user: Annotated[User, Depends(get_current_active_user)],
-    session: Annotated[Session, Depends(get_session)],
+    session: Annotated[AsyncSession, Depends(get_session)],
 ) -> UserRead:
-    userDB = get_user_from_id(user_id, session)
-    if not userDB:
+    async def load_user() -> UserRead | None:
+        userDB = await get_user_from_id(user_id, session)
+        return userReadFrom(userDB) if userDB else None
+
+    userRead = await cached_read("user", user_id, UserRead, load_user)
+    if not userRead:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=apiMessages.user_not_found,
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return UserRead(
-        id=userDB.public_id,
-        email=userDB.email,
-        username=userDB.username,
-        full_name=userDB.name,
-        admin=userDB.admin,
-        disabled=userDB.disabled,
-        created_at=userDB.created_at.strftime("%a %d %b %Y, %I:%M%p"),
-    )
+    return userRead
@@ -12,7 +12,7 @@ class rgb:
     b: float = 0
 
 
-def monthly_report_pdf(report: MonthlyReport, filename: str):
+def monthly_report_pdf(report: MonthlyReport) -> bytes:
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=16, style="B")
@@ -83,4 +83,5 @@ def monthly_report_pdf(report: MonthlyReport, filename: str):
             pdf.set_fill_color(**asdict(pdfPallete[0]))
             pdf.ln(5)
 
-    pdf.output(filename)
+    # Rendered in memory, dest="S" returns the document as a latin-1 string
+    return pdf.output(dest="S").encode("latin-1")
@@ -1,50 +1,165 @@
 import os
+import threading
+from datetime import timedelta
+from io import BytesIO
+from typing import BinaryIO
 from uuid import uuid4
 
+import certifi
+import urllib3
 from minio import Minio
 from minio.error import S3Error
 
 from app.core.config import settings
 from app.core.errors import BlobError
 
+# Clients are created once per process and reused, each keeps its own connection pool
+# and caches the bucket region used to sign urls
+_clients: dict[tuple[str, bool], Minio] = {}
+_clientsPid = os.getpid()
+_clientsLock = threading.Lock()
+# Clients inherited through fork. Their sockets belong to the parent, so they are kept
+# referenced instead of being collected, Minio.__del__ would close the pool
+_forkedClients: list[Minio] = []
 
-def create_bucket():
-    client_internal = Minio(
-        settings.blob.internal_endpoint,
-        access_key=settings.blob.user,
-        secret_key=settings.blob.password,
-        secure=settings.blob.internal_secure,
+
+def create_http_pool() -> urllib3.PoolManager:
+    # Same defaults as Minio's own pool but sized and timed from settings
+    return urllib3.PoolManager(
+        timeout=urllib3.Timeout(
+            connect=settings.blob.connect_timeout, read=settings.blob.read_timeout
+        ),
+        maxsize=settings.blob.pool_maxsize,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(
+            total=settings.blob.retries,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
     )
+
+
+def get_client(endpoint: str, secure: bool) -> Minio:
+    global _clientsPid
+    with _clientsLock:
+        # Celery prefork workers fork after import, a child must open its own connections
+        if _clientsPid != os.getpid():
+            _forkedClients.extend(_clients.values())
+            _clients.clear()
+            _clientsPid = os.getpid()
+        client = _clients.get((endpoint, secure))
+        if client is None:
+            client = Minio(
+                endpoint,
+                access_key=settings.blob.user,
+                secret_key=settings.blob.password,
+                secure=secure,
+                http_client=create_http_pool(),
+            )
+            _clients[(endpoint, secure)] = client
+        return client
+
+
+def reset_clients():
+    with _clientsLock:
+        _clients.clear()
+
+
+def internal_client() -> Minio:
+    return get_client(settings.blob.internal_endpoint, settings.blob.internal_secure)
+
+
+def public_client() -> Minio:
+    # only public client needs secure since internal is in a secure channel
+    return get_client(settings.blob.public_endpoint, settings.blob.public_secure)
+
+
+def create_bucket():
+    client_internal = internal_client()
     found = client_internal.bucket_exists(settings.blob.bucket)
     if not found:
         client_internal.make_bucket(settings.blob.bucket)
 
 
-def upload(file_path: str, dest_folder_name: str) -> str:
-    client_internal = Minio(
-        settings.blob.internal_endpoint,
-        access_key=settings.blob.user,
-        secret_key=settings.blob.password,
-        secure=settings.blob.internal_secure,
-    )
-    # only public client needs secure since internal is in a secure channel
-    client_public = Minio(
-        settings.blob.public_endpoint,
-        access_key=settings.blob.user,
-        secret_key=settings.blob.password,
-        secure=settings.blob.public_secure,
+def presigned_url(dest_path: str) -> str:
+    # pre-signed urls use the public client so they can be accessed from the public endpoint
+    return public_client().presigned_get_object(
+        settings.blob.bucket,
+        dest_path,
+        expires=timedelta(seconds=settings.blob.url_ttl),
     )
+
+
+def object_path(dest_folder_name: str, object_name: str, file_extension: str) -> str:
+    return f"{dest_folder_name}/{object_name}{file_extension}"
+
+
+def new_object_path(dest_folder_name: str, file_extension: str) -> str:
+    return object_path(dest_folder_name, uuid4().hex, file_extension)
+
+
+def stored_url(dest_path: str) -> str | None:
+    # Signs a new url for an object that is already in the bucket, None if there's none
+    try:
+        internal_client().stat_object(settings.blob.bucket, dest_path)
+        return presigned_url(dest_path)
+    except S3Error as err:
+        if err.code == "NoSuchKey":
+            return None
+        raise BlobError(f"S3 operation failed: {str(err)}") from err
+
+
+def upload(file_path: str, dest_folder_name: str) -> str:
     _, file_extension = os.path.splitext(file_path)
-    fileId = uuid4().hex
-    dest_path = f"{dest_folder_name}/{fileId}{file_extension}"
+    dest_path = new_object_path(dest_folder_name, file_extension)
 
     try:
-        client_internal.fput_object(settings.blob.bucket, dest_path, file_path)
-        # pre-signed urls use the public client so they can be accessed from the public endpoint
-        return client_public.presigned_get_object(settings.blob.bucket, dest_path)
+        internal_client().fput_object(settings.blob.bucket, dest_path, file_path)
+        return presigned_url(dest_path)
     except S3Error as err:
         raise BlobError(f"S3 operation failed: {str(err)}") from err
 
 
+def upload_stream(
+    data: BinaryIO,
+    length: int,
+    file_extension: str,
+    dest_folder_name: str,
+    content_type: str = "application/octet-stream",
+    object_name: str | None = None,
+) -> str:
+    # A given object_name replaces whatever was stored under it, otherwise it's random
+    if object_name is None:
+        dest_path = new_object_path(dest_folder_name, file_extension)
+    else:
+        dest_path = object_path(dest_folder_name, object_name, file_extension)
+
+    try:
+        internal_client().put_object(
+            settings.blob.bucket, dest_path, data, length, content_type=content_type
+        )
+        return presigned_url(dest_path)
+    except S3Error as err:
+        raise BlobError(f"S3 operation failed: {str(err)}") from err
+
+
+def upload_bytes(
+    data: bytes,
+    file_extension: str,
+    dest_folder_name: str,
+    content_type: str = "application/octet-stream",
+    object_name: str | None = None,
+) -> str:
+    return upload_stream(
+        BytesIO(data),
+        len(data),
+        file_extension,
+        dest_folder_name,
+        content_type,
+        object_name,
+    )
+
+
 if __name__ == "__main__":
     create_bucket()
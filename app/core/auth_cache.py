@@ -0,0 +1,79 @@
+from typing import Awaitable, cast
+
+from pydantic import BaseModel
+from redis.exceptions import RedisError
+
+from .cache import TTLCache
+from .config import settings
+from .metrics import inc_cache_request
+from .redis_client import get_async_redis
+
+
+# Just what authorization needs, so a cached user can skip the users query
+class AuthPrincipal(BaseModel):
+    id: int
+    public_id: str
+    username: str
+    admin: bool
+    disabled: bool
+
+
+# Keyed by (sub, jti) so an entry never outlives the access token it was built for.
+# Only used without redis, a process can't see the invalidations of the others, so
+# with several processes every lookup goes to the shared redis entry instead
+localCache: TTLCache[tuple[str, str]] = TTLCache(
+    settings.auth.cacheSize, settings.auth.cacheTTL
+)
+
+
+def redis_key(username: str) -> str:
+    return f"auth:principal:{username}"
+
+
+async def get_principal(username: str, jti: str) -> AuthPrincipal | None:
+    if not settings.auth.cacheRedis:
+        principal = localCache.get((username, jti))
+        inc_cache_request("auth", "miss" if principal is None else "hit")
+        return principal
+
+    try:
+        raw = await cast(
+            Awaitable[bytes | None], get_async_redis().hget(redis_key(username), jti)
+        )
+    except RedisError:
+        # Cache is best effort, the caller falls back to the database
+        raw = None
+    if raw is None:
+        inc_cache_request("auth", "miss")
+        return None
+    inc_cache_request("auth", "hit")
+    return AuthPrincipal.model_validate_json(raw)
+
+
+async def set_principal(username: str, jti: str, principal: AuthPrincipal):
+    if settings.auth.cacheTTL <= 0:
+        return
+    if not settings.auth.cacheRedis:
+        localCache.set((username, jti), principal)
+        return
+
+    try:
+        # One hash per user so invalidation is a single DEL
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            pipe.hset(redis_key(username), jti, principal.model_dump_json())
+            pipe.expire(redis_key(username), settings.auth.cacheTTL)
+            await pipe.execute()
+    except RedisError:
+        pass
+
+
+# Deleting the redis hash reaches every process at once
+async def invalidate_user(username: str):
+    if not settings.auth.cacheRedis:
+        localCache.delete_where(lambda key: key[0] == username)
+        return
+
+    try:
+        await get_async_redis().delete(redis_key(username))
+    except RedisError:
+        pass
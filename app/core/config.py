@@ -4,17 +4,59 @@ from typing import Optional
 from pydantic import BaseModel
 
 
-def getBoolEnv(varName: str) -> bool:
-    envVar = os.getenv(varName, "false")
+def getBoolEnv(varName: str, default: bool = False) -> bool:
+    envVar = os.getenv(varName, "true" if default else "false")
     trueVals = ["true", "True", "TRUE", "T"]
     return envVar in trueVals
 
 
+def getListEnv(varName: str, default: str) -> list[str]:
+    envVar = os.getenv(varName, default)
+    return [value.strip() for value in envVar.split(",") if value.strip()]
+
+
 class AuthSettings(BaseModel):
     jwtAlg: str = os.getenv("JWT_ALG", "")
     jwtSecret: str = os.getenv("JWT_SECRET", "")
     accessTTL: int = int(os.getenv("ACCESS_TTL_MIN", ""))
     refreshTTL: int = int(os.getenv("REFRESH_TTL_DAYS", ""))
+    # Authenticated users are cached per token for this long, 0 disables the cache
+    cacheTTL: int = int(os.getenv("AUTH_CACHE_TTL_SEC", 30))
+    cacheSize: int = int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000))
+    # Keeps cached users in redis only, needed with several API processes since
+    # a per-process cache keeps serving users that another process changed
+    cacheRedis: bool = getBoolEnv("AUTH_CACHE_REDIS")
+
+
+class HashingSettings(BaseModel):
+    # bcrypt releases the GIL so a thread pool is enough to run hashes in parallel
+    workers: int = int(os.getenv("HASH_WORKERS", 4))
+    # Hashes waiting or running before requests are rejected with 503
+    max_pending: int = int(os.getenv("HASH_MAX_PENDING", 32))
+
+
+class MetricsSettings(BaseModel):
+    # How often beat rebuilds the job counters from the jobs table
+    job_counts_reconcile_sec: float = float(os.getenv("JOB_COUNTS_RECONCILE_SEC", 300))
+    # Upper bounds of the request latency histogram, in seconds
+    http_buckets: list[float] = [
+        float(bucket)
+        for bucket in getListEnv(
+            "HTTP_LATENCY_BUCKETS",
+            "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10",
+        )
+    ]
+    # Paths left out of every http metric
+    excluded_paths: list[str] = getListEnv(
+        "METRICS_EXCLUDED_PATHS", "/,/docs,/openapi.json,/health,/metrics,/favicon.ico"
+    )
+    # Read by prometheus_client itself, set it when running several API workers
+    multiproc_dir: str | None = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+class CacheSettings(BaseModel):
+    # Single entity GETs cache their response in redis for this long, 0 disables it
+    entity_ttl: int = int(os.getenv("ENTITY_CACHE_TTL_SEC", 60))
 
 
 class SentrySettings(BaseModel):
@@ -29,12 +71,17 @@ class DatabaseSettings(BaseModel):
     port: int = int(os.getenv("DB_PORT", ""))
     db: str = os.getenv("POSTGRES_DB", "")
     driver: str = os.getenv("DB_DRIVER", "")
+    # Driver used by the API, must support asyncio (psycopg 3 or asyncpg)
+    async_driver: str = os.getenv("DB_ASYNC_DRIVER", "postgresql+psycopg")
 
     def build_url(self) -> str:
         return (
             f"{self.driver}://{self.user}:{self.pwd}@{self.host}:{self.port}/{self.db}"
         )
 
+    def build_async_url(self) -> str:
+        return f"{self.async_driver}://{self.user}:{self.pwd}@{self.host}:{self.port}/{self.db}"
+
 
 class RedisSettings(BaseModel):
     host: str | None = os.getenv("REDIS_HOST", "localhost")
@@ -45,6 +92,25 @@ class RedisSettings(BaseModel):
         return f"redis://{self.host}:{self.port}/{self.db}"
 
 
+class WorkerSettings(BaseModel):
+    # Celery results are only stored when a backend is set, job state lives in the jobs table
+    result_backend: str | None = os.getenv("CELERY_RESULT_BACKEND") or None
+    ignore_result: bool = getBoolEnv("CELERY_TASK_IGNORE_RESULT", default=True)
+    result_expires: int = int(os.getenv("CELERY_RESULT_EXPIRES_SEC", 3600))
+    # Tasks each worker process reserves ahead, keep it at 1 for long tasks
+    prefetch_multiplier: int = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", 1))
+    # Ack once the task ran so a crashed worker's task is delivered again
+    acks_late: bool = getBoolEnv("CELERY_ACKS_LATE", default=True)
+    acks_on_failure_or_timeout: bool = getBoolEnv(
+        "CELERY_ACKS_ON_FAILURE_OR_TIMEOUT", default=True
+    )
+    reject_on_worker_lost: bool = getBoolEnv(
+        "CELERY_REJECT_ON_WORKER_LOST", default=True
+    )
+    # Unacked tasks are delivered again after this long, must exceed the longest task
+    visibility_timeout: int = int(os.getenv("CELERY_VISIBILITY_TIMEOUT_SEC", 3600))
+
+
 class BlobSettings(BaseModel):
     internal_endpoint: str = os.getenv("MINIO_INTERNAL_ENDPOINT", "localhost:9000")
     public_endpoint: str = os.getenv("MINIO_PUBLIC_ENDPOINT", "localhost:9000")
@@ -53,15 +119,26 @@ class BlobSettings(BaseModel):
     bucket: str = os.getenv("MINIO_DEFAULT_BUCKETS", "")
     internal_secure: bool = getBoolEnv("MINIO_INTERNAL_SECURE")
     public_secure: bool = getBoolEnv("MINIO_PUBLIC_SECURE")
+    # Connection pool shared by every request of a client, one client per endpoint and process
+    pool_maxsize: int = int(os.getenv("MINIO_POOL_MAXSIZE", 10))
+    retries: int = int(os.getenv("MINIO_RETRIES", 5))
+    connect_timeout: float = float(os.getenv("MINIO_CONNECT_TIMEOUT_SEC", 5))
+    read_timeout: float = float(os.getenv("MINIO_READ_TIMEOUT_SEC", 60))
+    # Presigned urls stay valid this long, S3 accepts at most 7 days
+    url_ttl: int = int(os.getenv("MINIO_URL_TTL_SEC", 7 * 24 * 3600))
 
 
 class Settings(BaseModel):
     env: str = os.getenv("APP_ENV", "")
 
     auth: AuthSettings = AuthSettings()
+    hashing: HashingSettings = HashingSettings()
     database: DatabaseSettings = DatabaseSettings()
     sentry: SentrySettings = SentrySettings()
+    metrics: MetricsSettings = MetricsSettings()
     redis: RedisSettings = RedisSettings()
+    cache: CacheSettings = CacheSettings()
+    worker: WorkerSettings = WorkerSettings()
     blob: BlobSettings = BlobSettings()
 
 
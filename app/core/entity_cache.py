@@ -0,0 +1,114 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+from pydantic import BaseModel, ValidationError
+from redis.exceptions import RedisError
+
+from .config import settings
+from .metrics import inc_cache_request
+from .redis_client import get_async_redis
+
+# Read-through cache of the DTOs served by the single entity GETs, keyed by public_id.
+# Every entity has a version that writers bump after committing. Entries are stored
+# with the version read before loading them, so a load that raced a write is stored
+# under an old version and never served
+
+M = TypeVar("M", bound=BaseModel)
+
+# Loads running in this process, concurrent misses for the same entity share one load
+inflight: dict[tuple[str, bytes], asyncio.Future] = {}
+
+
+def entry_key(kind: str, public_id: str) -> str:
+    return f"cache:{kind}:{public_id}"
+
+
+def version_key(kind: str, public_id: str) -> str:
+    return f"cache:{kind}:{public_id}:version"
+
+
+async def cached_read(
+    kind: str,
+    public_id: str,
+    model: type[M],
+    load: Callable[[], Awaitable[M | None]],
+) -> M | None:
+    # load returns None when the entity doesn't exist, which is never cached
+    ttl = settings.cache.entity_ttl
+    if ttl <= 0:
+        return await load()
+
+    key = entry_key(kind, public_id)
+    try:
+        raw, version = await get_async_redis().mget(key, version_key(kind, public_id))
+    except RedisError:
+        # Cache is best effort, the caller falls back to the database
+        return await load()
+    version = version or b"0"
+    if raw is not None:
+        rawVersion, _, dto = raw.partition(b":")
+        if rawVersion == version:
+            try:
+                cached = model.model_validate_json(dto)
+                inc_cache_request(kind, "hit")
+                return cached
+            except ValidationError:
+                # Written by a deploy with another shape of the DTO, reloaded below
+                pass
+    inc_cache_request(kind, "miss")
+
+    # Only loads that started from the same version are shared
+    flightKey = (key, version)
+    while flightKey in inflight:
+        shared = inflight[flightKey]
+        try:
+            # Shielded so a cancelled waiter doesn't cancel the shared load
+            return await asyncio.shield(shared)
+        except asyncio.CancelledError:
+            # A cancelled leader hands the load over to the first of its waiters
+            if not shared.cancelled():
+                raise
+    future = asyncio.get_running_loop().create_future()
+    inflight[flightKey] = future
+    try:
+        result = await load()
+        future.set_result(result)
+    except Exception as e:
+        future.set_exception(e)
+        # Marks it retrieved in case nobody was waiting
+        future.exception()
+        raise
+    finally:
+        del inflight[flightKey]
+        if not future.done():
+            future.cancel()
+
+    if result is not None:
+        try:
+            async with get_async_redis().pipeline(transaction=False) as pipe:
+                pipe.set(
+                    key, version + b":" + result.model_dump_json().encode(), ex=ttl
+                )
+                # Versions outlive their entries so an expired version can't come
+                # back around to the value of an old entry
+                pipe.expire(version_key(kind, public_id), ttl * 10)
+                await pipe.execute()
+        except RedisError:
+            pass
+    return result
+
+
+# Called after the write commits. Entries left behind by a failed bump expire with the TTL
+async def invalidate(kind: str, *public_ids: str):
+    if settings.cache.entity_ttl <= 0 or not public_ids:
+        return
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for public_id in public_ids:
+                pipe.incr(version_key(kind, public_id))
+                pipe.expire(
+                    version_key(kind, public_id), settings.cache.entity_ttl * 10
+                )
+            await pipe.execute()
+    except RedisError:
+        pass
@@ -6,6 +6,10 @@ class UnknownError(AppError):
     pass
 
 
+class HashingBusyError(AppError):
+    pass
+
+
 class ExternalServiceError(AppError):
     pass
 
@@ -0,0 +1,63 @@
+from redis.exceptions import RedisError
+
+from .redis_client import get_async_redis, get_redis
+
+# Number of jobs per state and job type, shared by the API and the workers.
+# Transitions adjust them as they happen and the reconciler task rewrites them
+# from the jobs table, which also corrects the drift of any failed update
+
+
+def counter_key(state: str) -> str:
+    return f"jobs:count:{state}"
+
+
+def job_state_changed(job_type: str, old_state: str | None, new_state: str | None):
+    try:
+        with get_redis().pipeline() as pipe:
+            if old_state is not None:
+                pipe.hincrby(counter_key(old_state), job_type, -1)
+            if new_state is not None:
+                pipe.hincrby(counter_key(new_state), job_type, 1)
+            pipe.execute()
+    except RedisError:
+        # Counters are best effort, the reconciler fixes them
+        pass
+
+
+async def job_state_changed_async(
+    job_type: str, old_state: str | None, new_state: str | None
+):
+    try:
+        async with get_async_redis().pipeline() as pipe:
+            if old_state is not None:
+                pipe.hincrby(counter_key(old_state), job_type, -1)
+            if new_state is not None:
+                pipe.hincrby(counter_key(new_state), job_type, 1)
+            await pipe.execute()
+    except RedisError:
+        pass
+
+
+async def read_job_counts(states: list[str]) -> dict[str, dict[str, int]] | None:
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for state in states:
+                pipe.hgetall(counter_key(state))
+            results = await pipe.execute()
+    except RedisError:
+        return None
+
+    return {
+        state: {jobType.decode(): int(count) for jobType, count in result.items()}
+        for state, result in zip(states, results)
+    }
+
+
+def write_job_counts(counts: dict[str, dict[str, int]]):
+    # Replaces every state in one transaction so readers never see a partial rewrite
+    with get_redis().pipeline() as pipe:
+        for state, byType in counts.items():
+            pipe.delete(counter_key(state))
+            if byType:
+                pipe.hset(counter_key(state), mapping=byType)
+        pipe.execute()
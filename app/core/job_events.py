@@ -0,0 +1,73 @@
+import asyncio
+
+from redis.asyncio.client import PubSub
+from redis.exceptions import RedisError
+
+from .redis_client import get_async_redis, get_redis
+
+# Workers publish every job transition so clients waiting on a job wake up right away
+# instead of polling the jobs table. Messages only carry the new state, waiters
+# reload the job themselves
+
+# How often waiters recheck the job while redis can't be reached
+FALLBACK_POLL_SEC = 2.0
+
+
+def job_channel(public_id: str) -> str:
+    return f"jobs:events:{public_id}"
+
+
+def publish_job_event(public_id: str, state: str):
+    try:
+        get_redis().publish(job_channel(public_id), state)
+    except RedisError:
+        # Waiters fall back to their timeout, events are best effort
+        pass
+
+
+class JobEvents:
+    """Subscription to the transitions of one job, used as an async context manager."""
+
+    def __init__(self, public_id: str):
+        self.public_id = public_id
+        self.pubsub: PubSub | None = None
+
+    # Enter before reading the job so a transition in between isn't missed
+    async def __aenter__(self) -> "JobEvents":
+        try:
+            self.pubsub = get_async_redis().pubsub()
+            await self.pubsub.subscribe(job_channel(self.public_id))
+        except RedisError:
+            await self.close()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self.pubsub is not None:
+            pubsub, self.pubsub = self.pubsub, None
+            try:
+                await pubsub.aclose()
+            except RedisError:
+                pass
+
+    async def wait(self, timeout: float) -> bool:
+        # True when the job may have changed and should be reloaded, False on timeout
+        if self.pubsub is None:
+            await asyncio.sleep(min(timeout, FALLBACK_POLL_SEC))
+            return timeout > FALLBACK_POLL_SEC
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=remaining
+                )
+            except RedisError:
+                await self.close()
+                return True
+            if message is not None:
+                return True
+        return False
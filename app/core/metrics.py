@@ -1,35 +1,196 @@
+import glob
+import os
+import re
+
 from fastapi import Request, Response
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, generate_latest
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    Summary,
+    generate_latest,
+    multiprocess,
+)
+
+from .config import settings
 
 REQUEST_COUNT = Counter(
     "http_requests_total", "Total HTTP requests", ["method", "endpoint", "status"]
 )
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time until the response headers are sent",
+    ["method", "endpoint", "status"],
+    buckets=settings.metrics.http_buckets,
+)
+# The route isn't resolved before the request runs, so only the method is known
+# livesum adds up the workers that are still alive in multiprocess mode
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+REQUEST_SIZE = Summary(
+    "http_request_size_bytes", "HTTP request body size", ["method", "endpoint"]
+)
+RESPONSE_SIZE = Summary(
+    "http_response_size_bytes", "HTTP response body size", ["method", "endpoint"]
+)
 
-# Defined as Gauge since values are rebuilt everytime it checks the jobs database
-JOBS_SUCCEEDED_GAUGE = Gauge("jobs_succeeded_total", "Jobs Succeeded", ["type"])
-JOBS_ENQUEUED_GAUGE = Gauge("jobs_enqueued_total", "Jobs Enqueued", ["type"])
-JOBS_FAILED_GAUGE = Gauge("jobs_failed_total", "Jobs Failed", ["type"])
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by result", ["cache", "result"]
+)
 
+PASSWORD_HASH_TIME = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing or verifying passwords",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Password operations rejected because the hashing pool was full",
+    ["operation"],
+)
 
-def inc_request_count(request: Request, response: Response):
-    ignore = ["/", "/docs", "/openapi.json", "/health", "/metrics", "/favicon.ico"]
-    if request.url.path in ignore:
+# Defined as Gauge since values are rebuilt from the job counters on every scrape
+# Whichever worker serves the scrape sets them, so the most recent value wins
+JOBS_SUCCEEDED_GAUGE = Gauge(
+    "jobs_succeeded_total", "Jobs Succeeded", ["type"], multiprocess_mode="mostrecent"
+)
+JOBS_ENQUEUED_GAUGE = Gauge(
+    "jobs_enqueued_total", "Jobs Enqueued", ["type"], multiprocess_mode="mostrecent"
+)
+JOBS_FAILED_GAUGE = Gauge(
+    "jobs_failed_total", "Jobs Failed", ["type"], multiprocess_mode="mostrecent"
+)
+
+
+def metrics_registry() -> CollectorRegistry:
+    # In multiprocess mode every worker writes its values to files in the directory
+    # and a scrape aggregates all of them, whichever worker serves it
+    if not settings.metrics.multiproc_dir:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=settings.metrics.multiproc_dir)
+    return registry
+
+
+def render_metrics() -> bytes:
+    return generate_latest(metrics_registry())
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def reset_multiproc_dir():
+    # Runs once before any worker starts. Files of a previous run can't be told apart
+    # by pid since pids are reused across restarts, so all of them are removed
+    path = settings.metrics.multiproc_dir
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for filename in glob.glob(os.path.join(path, "*.db")):
+        os.remove(filename)
+
+
+def cleanup_dead_processes():
+    # Live gauges of workers that died during this run would be summed forever,
+    # counters and histograms are kept since what they counted did happen
+    path = settings.metrics.multiproc_dir
+    if not path:
         return
+    pids = set()
+    for filename in glob.glob(os.path.join(path, "gauge_live*_*.db")):
+        match = re.search(r"_(\d+)\.db$", filename)
+        if match:
+            pids.add(int(match.group(1)))
+    for pid in pids:
+        if not is_process_alive(pid):
+            multiprocess.mark_process_dead(pid, path)
+
 
+def is_excluded(request: Request) -> bool:
+    return request.url.path in settings.metrics.excluded_paths
+
+
+def route_template(request: Request) -> str:
     route = request.scope.get("route")
     # Gets the template instead of the raw url
     # Eg: /users/{user_id} instead of /users/dsaio201h3fdsfdsx
     # It's possible to call route.path_format, but it will throw an exception if not found
-    route_tmpl = getattr(route, "path_format", request.url.path)
+    return getattr(route, "path_format", request.url.path)
+
+
+def inc_request_count(request: Request, response: Response):
+    if is_excluded(request):
+        return
+
     REQUEST_COUNT.labels(
-        method=request.method, endpoint=route_tmpl, status=str(response.status_code)
+        method=request.method,
+        endpoint=route_template(request),
+        status=str(response.status_code),
     ).inc()
 
 
+def inc_requests_in_progress(request: Request):
+    if not is_excluded(request):
+        REQUESTS_IN_PROGRESS.labels(method=request.method).inc()
+
+
+def dec_requests_in_progress(request: Request):
+    if not is_excluded(request):
+        REQUESTS_IN_PROGRESS.labels(method=request.method).dec()
+
+
+def observe_request(request: Request, response: Response, seconds: float):
+    if is_excluded(request):
+        return
+
+    endpoint = route_template(request)
+    REQUEST_DURATION.labels(
+        method=request.method, endpoint=endpoint, status=str(response.status_code)
+    ).observe(seconds)
+    # Sizes come from Content-Length, chunked bodies such as the exports have none
+    requestSize = request.headers.get("content-length")
+    if requestSize is not None:
+        REQUEST_SIZE.labels(method=request.method, endpoint=endpoint).observe(
+            int(requestSize)
+        )
+    responseSize = response.headers.get("content-length")
+    if responseSize is not None:
+        RESPONSE_SIZE.labels(method=request.method, endpoint=endpoint).observe(
+            int(responseSize)
+        )
+
+
 def clear_jobs_gauges():
-    JOBS_SUCCEEDED_GAUGE.clear()
-    JOBS_ENQUEUED_GAUGE.clear()
-    JOBS_FAILED_GAUGE.clear()
+    gauges = [JOBS_SUCCEEDED_GAUGE, JOBS_ENQUEUED_GAUGE, JOBS_FAILED_GAUGE]
+    if not settings.metrics.multiproc_dir:
+        for gauge in gauges:
+            gauge.clear()
+        return
+
+    # clear() only forgets this process's labels, the values stay in the files of
+    # every process and keep being exported, so every exported label is zeroed
+    byName = {gauge.describe()[0].name: gauge for gauge in gauges}
+    for family in metrics_registry().collect():
+        gauge = byName.get(family.name)
+        if gauge is None:
+            continue
+        for sample in family.samples:
+            gauge.labels(type=sample.labels["type"]).set(0)
 
 
 def set_jobs_succeeded_gauge(job_type: str, count: int):
@@ -42,3 +203,19 @@ def set_jobs_enqueued_gauge(job_type: str, count: int):
 
 def set_jobs_failed_gauge(job_type: str, count: int):
     JOBS_FAILED_GAUGE.labels(type=job_type).set(count)
+
+
+def inc_cache_request(cache: str, result: str):
+    CACHE_REQUESTS.labels(cache=cache, result=result).inc()
+
+
+def observe_password_hash(operation: str, seconds: float):
+    PASSWORD_HASH_TIME.labels(operation=operation).observe(seconds)
+
+
+def inc_password_hash_rejected(operation: str):
+    PASSWORD_HASH_REJECTED.labels(operation=operation).inc()
+
+
+if __name__ == "__main__":
+    reset_multiproc_dir()
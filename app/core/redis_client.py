@@ -0,0 +1,23 @@
+import redis
+import redis.asyncio as aioredis
+
+from .config import settings
+
+_client: redis.Redis | None = None
+_async_client: aioredis.Redis | None = None
+
+
+# Created on first use so processes that never talk to redis don't open a pool
+# redis-py resets the pool itself when used from a forked worker
+def get_redis() -> redis.Redis:
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.redis.build_url())
+    return _client
+
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(settings.redis.build_url())
+    return _async_client
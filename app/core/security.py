@@ -1,3 +1,7 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import jwt
@@ -6,9 +10,18 @@ from passlib.context import CryptContext
 from pydantic import BaseModel
 
 from .config import settings
+from .errors import HashingBusyError
+from .metrics import inc_password_hash_rejected, observe_password_hash
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt takes hundreds of ms of CPU, so the async versions below run it on this pool
+# instead of the event loop. The semaphore bounds how many calls can wait on the pool
+hash_executor = ThreadPoolExecutor(
+    max_workers=settings.hashing.workers, thread_name_prefix="pwd-hash"
+)
+hash_slots = threading.BoundedSemaphore(settings.hashing.max_pending)
+
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -18,6 +31,39 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+def _timed(operation: str, func, *args):
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        observe_password_hash(operation, time.perf_counter() - start)
+
+
+async def _run_hashing(operation: str, func, *args):
+    if not hash_slots.acquire(blocking=False):
+        inc_password_hash_rejected(operation)
+        raise HashingBusyError(f"Too many pending password operations ({operation})")
+    try:
+        job = hash_executor.submit(_timed, operation, func, *args)
+    except Exception:
+        hash_slots.release()
+        raise
+    # The slot is held until the job is done, a caller that stops waiting leaves it
+    # queued or running in the pool
+    job.add_done_callback(lambda _: hash_slots.release())
+    return await asyncio.wrap_future(job)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await _run_hashing(
+        "verify", verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password) -> str:
+    return await _run_hashing("hash", get_password_hash, password)
+
+
 class Token(BaseModel):
     access_token: str
     refresh_token: str
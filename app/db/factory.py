@@ -45,7 +45,7 @@ def create_project(user: User, **overrides) -> Project:
 def create_issue(project: Project, owner: User, assigned: User, **overrides) -> Issue:
     defaults = {
         "title": "New Issue",
-        "key": "1",
+        "key": 1,
         "description": "An issue has been found",
         "status": IssueStatus.OPEN,
         "priority": IssuePriority.MEDIUM,
@@ -88,7 +88,8 @@ def create_job(user: User, **overrides) -> Job:
         "job_type": "generate-report",
         "state": JobState.QUEUED,
         "idempotency_key": uuid4().hex,
-        "request_hash": create_request_hash(None, None),
+        # Unfinished jobs with the same hash can't coexist, each one gets its own input
+        "request_hash": create_request_hash({"job": uuid4().hex}, None),
     }
     defaults.update(overrides)
 
@@ -0,0 +1,81 @@
+"""Added issue number counter
+
+Revision ID: 0a9c3e5b7d21
+Revises: f4b8d2e6a371
+Create Date: 2025-11-03 11:26:40.517382
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0a9c3e5b7d21"
+down_revision: Union[str, Sequence[str], None] = "f4b8d2e6a371"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        "issues",
+        "key",
+        existing_type=sa.String(length=20),
+        type_=sa.Integer(),
+        postgresql_using="key::integer",
+    )
+    # Concurrent creates could end up with the same key, later duplicates get
+    # new keys after the highest one of their project
+    op.execute("""
+        UPDATE issues SET key = renumbered.key
+        FROM (
+            SELECT duplicates.id,
+                   highest.key + row_number() OVER (
+                       PARTITION BY duplicates.project_id ORDER BY duplicates.id
+                   ) AS key
+            FROM (
+                SELECT id, project_id,
+                       row_number() OVER (
+                           PARTITION BY project_id, key ORDER BY id
+                       ) AS position
+                FROM issues
+            ) AS duplicates
+            JOIN (
+                SELECT project_id, max(key) AS key FROM issues GROUP BY project_id
+            ) AS highest ON highest.project_id = duplicates.project_id
+            WHERE duplicates.position > 1
+        ) AS renumbered
+        WHERE issues.id = renumbered.id
+        """)
+    op.create_unique_constraint(
+        "uq_issues_project_id_key", "issues", ["project_id", "key"]
+    )
+    op.add_column(
+        "projects",
+        sa.Column(
+            "next_issue_number", sa.Integer(), server_default="1", nullable=False
+        ),
+    )
+    op.execute("""
+        UPDATE projects SET next_issue_number = highest.key + 1
+        FROM (
+            SELECT project_id, max(key) AS key FROM issues GROUP BY project_id
+        ) AS highest
+        WHERE highest.project_id = projects.id
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("projects", "next_issue_number")
+    op.drop_constraint("uq_issues_project_id_key", "issues", type_="unique")
+    op.alter_column(
+        "issues",
+        "key",
+        existing_type=sa.Integer(),
+        type_=sa.String(length=20),
+        postgresql_using="key::varchar",
+    )
@@ -0,0 +1,54 @@
+"""Added job coalescing indexes
+
+Revision ID: 7e1b9d4f2a68
+Revises: 0a9c3e5b7d21
+Create Date: 2025-11-06 15:42:18.204913
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7e1b9d4f2a68"
+down_revision: Union[str, Sequence[str], None] = "0a9c3e5b7d21"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Report jobs used to share one hash, unfinished duplicates keep running but
+    # get a hash of their own so they don't block the unique index
+    op.execute("""
+        UPDATE jobs SET request_hash = jobs.request_hash || ':' || jobs.public_id
+        FROM (
+            SELECT id,
+                   row_number() OVER (
+                       PARTITION BY user_id, job_type, request_hash ORDER BY id DESC
+                   ) AS position
+            FROM jobs
+            WHERE state IN ('QUEUED', 'RUNNING')
+        ) AS duplicates
+        WHERE jobs.id = duplicates.id AND duplicates.position > 1
+        """)
+    op.create_index(
+        "ix_jobs_user_id_job_type_request_hash",
+        "jobs",
+        ["user_id", "job_type", "request_hash"],
+    )
+    op.create_index(
+        "uq_jobs_user_id_job_type_request_hash_unfinished",
+        "jobs",
+        ["user_id", "job_type", "request_hash"],
+        unique=True,
+        postgresql_where=sa.text("state IN ('QUEUED', 'RUNNING')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uq_jobs_user_id_job_type_request_hash_unfinished", table_name="jobs")
+    op.drop_index("ix_jobs_user_id_job_type_request_hash", table_name="jobs")
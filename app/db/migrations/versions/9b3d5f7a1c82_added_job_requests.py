@@ -0,0 +1,46 @@
+"""Added job requests
+
+Revision ID: 9b3d5f7a1c82
+Revises: 7e1b9d4f2a68
+Create Date: 2025-11-10 11:27:05.318462
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9b3d5f7a1c82"
+down_revision: Union[str, Sequence[str], None] = "7e1b9d4f2a68"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "job_requests",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("idempotency_key", sa.String(length=32), nullable=False),
+        sa.Column("job_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["job_id"], ["jobs.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "idempotency_key"),
+    )
+    op.create_index(
+        op.f("ix_job_requests_job_id"), "job_requests", ["job_id"], unique=False
+    )
+    # Existing jobs keep answering to the key they were created with
+    op.execute("""
+        INSERT INTO job_requests (user_id, idempotency_key, job_id, created_at)
+        SELECT user_id, idempotency_key, id, created_at FROM jobs
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_job_requests_job_id"), table_name="job_requests")
+    op.drop_table("job_requests")
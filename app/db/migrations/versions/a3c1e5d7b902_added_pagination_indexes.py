@@ -0,0 +1,48 @@
+"""Added pagination indexes
+
+Revision ID: a3c1e5d7b902
+Revises: 68f337ef00c9
+Create Date: 2025-10-20 10:14:32.518204
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c1e5d7b902"
+down_revision: Union[str, Sequence[str], None] = "68f337ef00c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing jobs get the closest timestamp available before the column is required
+    op.add_column("jobs", sa.Column("created_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE jobs SET created_at = COALESCE(started_at, updated_at)")
+    op.alter_column("jobs", "created_at", nullable=False)
+
+    op.create_index("ix_users_created_at_id", "users", ["created_at", "id"])
+    op.create_index(
+        "ix_projects_user_id_created_at_id",
+        "projects",
+        ["user_id", "created_at", "id"],
+    )
+    op.create_index("ix_artifacts_created_at_id", "artifacts", ["created_at", "id"])
+    op.create_index("ix_jobs_created_at_id", "jobs", ["created_at", "id"])
+    op.create_index(
+        "ix_jobs_state_created_at_id", "jobs", ["state", "created_at", "id"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_jobs_state_created_at_id", table_name="jobs")
+    op.drop_index("ix_jobs_created_at_id", table_name="jobs")
+    op.drop_index("ix_artifacts_created_at_id", table_name="artifacts")
+    op.drop_index("ix_projects_user_id_created_at_id", table_name="projects")
+    op.drop_index("ix_users_created_at_id", table_name="users")
+    op.drop_column("jobs", "created_at")
@@ -0,0 +1,27 @@
+"""Added issue report index
+
+Revision ID: b5d2f8a1c604
+Revises: a3c1e5d7b902
+Create Date: 2025-10-22 09:41:05.173820
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b5d2f8a1c604"
+down_revision: Union[str, Sequence[str], None] = "a3c1e5d7b902"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_issues_project_id_status", "issues", ["project_id", "status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_issues_project_id_status", table_name="issues")
@@ -0,0 +1,38 @@
+"""Added project monthly stats
+
+Revision ID: c8e4a6b2d917
+Revises: b5d2f8a1c604
+Create Date: 2025-10-23 15:02:47.906311
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c8e4a6b2d917"
+down_revision: Union[str, Sequence[str], None] = "b5d2f8a1c604"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "project_monthly_stats",
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("created", sa.Integer(), nullable=False),
+        sa.Column("closed", sa.Integer(), nullable=False),
+        sa.Column("open", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("project_id", "month"),
+    )
+    # Run python -m app.db.monthly_stats afterwards to fill it from existing issues
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("project_monthly_stats")
@@ -0,0 +1,56 @@
+"""Added issue search
+
+Revision ID: d1f7b3c9e245
+Revises: c8e4a6b2d917
+Create Date: 2025-10-27 11:26:53.480127
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "d1f7b3c9e245"
+down_revision: Union[str, Sequence[str], None] = "c8e4a6b2d917"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Generated column, postgres fills it for existing rows when it's added
+    op.add_column(
+        "issues",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_issues_search_vector",
+        "issues",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+    op.create_index(
+        "ix_comments_body_search",
+        "comments",
+        [sa.text("to_tsvector('english', body)")],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_comments_body_search", table_name="comments")
+    op.drop_index("ix_issues_search_vector", table_name="issues")
+    op.drop_column("issues", "search_vector")
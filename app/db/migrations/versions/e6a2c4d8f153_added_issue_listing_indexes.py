@@ -0,0 +1,42 @@
+"""Added issue listing indexes
+
+Revision ID: e6a2c4d8f153
+Revises: d1f7b3c9e245
+Create Date: 2025-10-28 16:48:09.215764
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e6a2c4d8f153"
+down_revision: Union[str, Sequence[str], None] = "d1f7b3c9e245"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_issues_project_id_status_updated_at",
+        "issues",
+        ["project_id", "status", "updated_at"],
+    )
+    op.create_index(
+        "ix_issues_assign_id_status_updated_at",
+        "issues",
+        ["assign_id", "status", "updated_at"],
+    )
+    op.create_index("ix_issues_author_id", "issues", ["author_id"])
+    # Covered by the new project index
+    op.drop_index("ix_issues_project_id_status", table_name="issues")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_issues_project_id_status", "issues", ["project_id", "status"])
+    op.drop_index("ix_issues_author_id", table_name="issues")
+    op.drop_index("ix_issues_assign_id_status_updated_at", table_name="issues")
+    op.drop_index("ix_issues_project_id_status_updated_at", table_name="issues")
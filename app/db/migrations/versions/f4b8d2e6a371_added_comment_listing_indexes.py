@@ -0,0 +1,37 @@
+"""Added comment listing indexes
+
+Revision ID: f4b8d2e6a371
+Revises: e6a2c4d8f153
+Create Date: 2025-10-29 10:05:38.662019
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f4b8d2e6a371"
+down_revision: Union[str, Sequence[str], None] = "e6a2c4d8f153"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_comments_issue_id_created_at_id",
+        "comments",
+        ["issue_id", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_comments_author_id_created_at_id",
+        "comments",
+        ["author_id", "created_at", "id"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_comments_author_id_created_at_id", table_name="comments")
+    op.drop_index("ix_comments_issue_id_created_at_id", table_name="comments")
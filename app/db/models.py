@@ -1,10 +1,20 @@
 import enum
-from datetime import datetime
+from datetime import date, datetime
 from typing import Any, List, Mapping
 from uuid import uuid4
 
-from sqlalchemy import DateTime, Enum, ForeignKey, String, UniqueConstraint
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import (
+    Computed,
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    String,
+    UniqueConstraint,
+    text,
+)
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -46,6 +56,8 @@ class JobResultKind(enum.StrEnum):
 
 class User(Base):
     __tablename__ = "users"
+    # Backs keyset pagination, which orders by (created_at, id)
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     public_id: Mapped[str] = mapped_column(
@@ -93,7 +105,10 @@ class User(Base):
 class Project(Base):
     __tablename__ = "projects"
     # Makes it so the combination user + key is unique
-    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_post_user_key"),)
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_post_user_key"),
+        Index("ix_projects_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     public_id: Mapped[str] = mapped_column(
@@ -103,6 +118,10 @@ class Project(Base):
     title: Mapped[str] = mapped_column(unique=True, nullable=False)
     key: Mapped[str] = mapped_column(String(4), unique=True, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    # Key of the project's next issue, bumped by the issue routes
+    next_issue_number: Mapped[int] = mapped_column(
+        nullable=False, default=1, server_default="1"
+    )
 
     # FK managed by sqlAlchemy, doesn't need to be set by our code
     # argument matches target table.field
@@ -131,14 +150,29 @@ class Membership(Base):
 
 class Issue(Base):
     __tablename__ = "issues"
+    __table_args__ = (
+        UniqueConstraint("project_id", "key", name="uq_issues_project_id_key"),
+        # Listing filters by project or assignee and status, sorted by the last update
+        Index(
+            "ix_issues_project_id_status_updated_at",
+            "project_id",
+            "status",
+            "updated_at",
+        ),
+        Index(
+            "ix_issues_assign_id_status_updated_at", "assign_id", "status", "updated_at"
+        ),
+        Index("ix_issues_author_id", "author_id"),
+        Index("ix_issues_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     public_id: Mapped[str] = mapped_column(
         String(32), unique=True, nullable=False, index=True, default=lambda: uuid4().hex
     )
     title: Mapped[str] = mapped_column(unique=True, nullable=False)
-    # human key like APP-42
-    key: Mapped[str] = mapped_column(String(20), nullable=False)
+    # number of the human key like APP-42, allocated from Project.next_issue_number
+    key: Mapped[int] = mapped_column(nullable=False)
     description: Mapped[str] = mapped_column()
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     updated_at: Mapped[datetime] = mapped_column(
@@ -155,6 +189,18 @@ class Issue(Base):
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     assign_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
 
+    # Kept up to date by postgres, title matches rank above description matches
+    # Deferred since only search queries need it
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+
     project: Mapped["Project"] = relationship(back_populates="issues")
     author: Mapped["User"] = relationship(
         back_populates="created_issues", foreign_keys=[author_id]
@@ -165,8 +211,34 @@ class Issue(Base):
     comments: Mapped[List["Comment"]] = relationship(back_populates="issue")
 
 
+# Issue counters per project and month, kept up to date by the issue routes
+# created/closed count the events of the month, open is the number of open issues
+# at the last write of the month and carries over to the next month's row
+class ProjectMonthlyStats(Base):
+    __tablename__ = "project_monthly_stats"
+    project_id: Mapped[int] = mapped_column(
+        ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True
+    )
+    # First day of the month
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    created: Mapped[int] = mapped_column(nullable=False, default=0)
+    closed: Mapped[int] = mapped_column(nullable=False, default=0)
+    open: Mapped[int] = mapped_column(nullable=False, default=0)
+
+
 class Comment(Base):
     __tablename__ = "comments"
+    # Issue search can match comment bodies, queries must use the same expression
+    __table_args__ = (
+        Index("ix_comments_issue_id_created_at_id", "issue_id", "created_at", "id"),
+        Index("ix_comments_author_id_created_at_id", "author_id", "created_at", "id"),
+        Index(
+            "ix_comments_body_search",
+            text("to_tsvector('english', body)"),
+            postgresql_using="gin",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     public_id: Mapped[str] = mapped_column(
@@ -201,6 +273,7 @@ class RefreshToken(Base):
 
 class Artifact(Base):
     __tablename__ = "artifacts"
+    __table_args__ = (Index("ix_artifacts_created_at_id", "created_at", "id"),)
     id: Mapped[int] = mapped_column(primary_key=True)
     public_id: Mapped[str] = mapped_column(
         String(32), unique=True, nullable=False, index=True, default=lambda: uuid4().hex
@@ -213,6 +286,26 @@ class Artifact(Base):
 
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_created_at_id", "created_at", "id"),
+        Index("ix_jobs_state_created_at_id", "state", "created_at", "id"),
+        # Requests for the same input look for a job they can reuse
+        Index(
+            "ix_jobs_user_id_job_type_request_hash",
+            "user_id",
+            "job_type",
+            "request_hash",
+        ),
+        # At most one unfinished job per input, concurrent requests attach to it
+        Index(
+            "uq_jobs_user_id_job_type_request_hash_unfinished",
+            "user_id",
+            "job_type",
+            "request_hash",
+            unique=True,
+            postgresql_where=text("state IN ('QUEUED', 'RUNNING')"),
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     public_id: Mapped[str] = mapped_column(
         String(32), unique=True, nullable=False, index=True, default=lambda: uuid4().hex
@@ -227,6 +320,7 @@ class Job(Base):
     )
     attempts: Mapped[int] = mapped_column(nullable=False, default=0)
 
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     updated_at: Mapped[datetime] = mapped_column(
@@ -266,3 +360,15 @@ class Job(Base):
     # Mapped["Artifact"|None] wouldn't work because it can't figure out it's an optional class
     # Had to change to direct class reference and define Artifact before so it can find it
     artifact: Mapped[Artifact | None] = relationship(back_populates="job")
+
+
+class JobRequest(Base):
+    # Every idempotency key a job was requested with, including requests that attached
+    # to an existing job, so a retry with any of them gets that job back
+    __tablename__ = "job_requests"
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    idempotency_key: Mapped[str] = mapped_column(String(32), primary_key=True)
+    job_id: Mapped[int] = mapped_column(
+        ForeignKey("jobs.id"), nullable=False, index=True
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
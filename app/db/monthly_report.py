@@ -1,12 +1,21 @@
 from collections import defaultdict
-from datetime import datetime, timezone
-from typing import List
+from datetime import date, datetime
+from typing import List, Sequence
 
 from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, Select, func, select
+from sqlalchemy.orm import Session, aliased
 
-from .models import Issue, IssuePriority, IssueStatus, Project, User
+from .factory import create_request_hash
+from .models import (
+    Issue,
+    IssuePriority,
+    IssueStatus,
+    Project,
+    ProjectMonthlyStats,
+    User,
+)
+from .monthly_stats import fetch_monthly_stats, month_start
 
 
 class IssueReport(BaseModel):
@@ -37,64 +46,89 @@ class MonthlyReport(BaseModel):
     projects: List[ProjectReport] = []
 
 
-def generate_issue_report(
-    session: Session, proj_key: str, issueDB: Issue
-) -> IssueReport:
+def generate_issue_report(proj_key: str, issueDB: Issue, creator: str) -> IssueReport:
     report = IssueReport()
     report.key = f"{proj_key}-{issueDB.key}"
     report.title = issueDB.title
     report.description = issueDB.description
-    report.creator = issueDB.author.username
+    report.creator = creator
     report.priority = issueDB.priority
     report.status = issueDB.status
 
     return report
 
 
-def generate_user_issue_report(
-    session: Session, username: str, proj_key: str, issuesDB: list[Issue]
-) -> UserIssueReport:
-    report = UserIssueReport()
-    report.username = username
-
-    for issueDB in issuesDB:
-        report.open_issues.append(generate_issue_report(session, proj_key, issueDB))
-
-    return report
+def fetch_open_issues(session: Session, project_ids: list[int]) -> list[Row]:
+    # Open issues of every project with assignee and author usernames in a single join
+    assignee = aliased(User)
+    author = aliased(User)
+    openQuery = (
+        select(
+            Issue,
+            assignee.username.label("assignee"),
+            author.username.label("creator"),
+        )
+        .join(assignee, Issue.assign_id == assignee.id)
+        .join(author, Issue.author_id == author.id)
+        .where(Issue.project_id.in_(project_ids), Issue.status == IssueStatus.OPEN)
+        .order_by(Issue.project_id, assignee.username, Issue.id)
+    )
+    return list(session.execute(openQuery))
 
 
-def generate_project_report(session: Session, projectDB: Project) -> ProjectReport:
+def generate_project_report(
+    projectDB: Project,
+    statsDB: ProjectMonthlyStats | None,
+    month: date,
+    openIssues: list[Row],
+) -> ProjectReport:
     report = ProjectReport()
     report.name = projectDB.title
 
-    year = datetime.today().year
-    month = datetime.today().month
-
-    issuesByUser = defaultdict(list)
-
-    for issueDB in projectDB.issues:
-        if issueDB.created_at.year == year and issueDB.created_at.month == month:
-            report.created_issues_month += 1
-
-        match issueDB.status:
-            case IssueStatus.OPEN:
-                report.open_issues += 1
-                issuesByUser[issueDB.assigned.username].append(issueDB)
-            case IssueStatus.CLOSED:
-                if (
-                    issueDB.updated_at.year == year
-                    and issueDB.updated_at.month == month
-                ):
-                    report.closed_issues_month += 1
-
-    for username, issues in issuesByUser.items():
-        report.user_issues.append(
-            generate_user_issue_report(session, username, projectDB.key, issues)
+    if statsDB is not None:
+        report.open_issues = statsDB.open
+        # An older row only carries the open count over, nothing happened this month
+        if statsDB.month == month:
+            report.created_issues_month = statsDB.created
+            report.closed_issues_month = statsDB.closed
+
+    userReports: dict[str, UserIssueReport] = {}
+    for row in openIssues:
+        userReport = userReports.get(row.assignee)
+        if userReport is None:
+            userReport = UserIssueReport(username=row.assignee)
+            userReports[row.assignee] = userReport
+            report.user_issues.append(userReport)
+        userReport.open_issues.append(
+            generate_issue_report(projectDB.key, row.Issue, row.creator)
         )
 
     return report
 
 
+def report_inputs_query(user_pk: int) -> Select:
+    # One row per project with what the report reads from it. Issue edits bump
+    # updated_at and deletes lower the count, so equal rows mean an equal report
+    return (
+        select(
+            Project.id,
+            Project.key,
+            Project.title,
+            func.count(Issue.id),
+            func.max(Issue.updated_at),
+        )
+        .outerjoin(Issue, Issue.project_id == Project.id)
+        .where(Project.user_id == user_pk)
+        .group_by(Project.id)
+        .order_by(Project.id)
+    )
+
+
+def report_fingerprint(month: date, inputs: Sequence[Row]) -> str:
+    projects = [[str(value) for value in row] for row in inputs]
+    return create_request_hash({"month": month.isoformat(), "projects": projects}, None)
+
+
 def generate_monthly_report(session: Session, user_id: str) -> MonthlyReport | None:
     userQuery = select(User).where(User.public_id == user_id)
     userDB = session.execute(userQuery).scalars().first()
@@ -108,8 +142,30 @@ def generate_monthly_report(session: Session, user_id: str) -> MonthlyReport | N
     )
     report.username = userDB.username
 
-    for projectDB in userDB.projects:
-        report.projects.append(generate_project_report(session, projectDB))
+    projectsQuery = (
+        select(Project).where(Project.user_id == userDB.id).order_by(Project.id)
+    )
+    projectsDB = session.execute(projectsQuery).scalars().all()
+    if not projectsDB:
+        return report
+
+    projectIds = [projectDB.id for projectDB in projectsDB]
+    month = month_start(datetime.today())
+    stats = fetch_monthly_stats(session, projectIds, month)
+
+    issuesByProject = defaultdict(list)
+    for row in fetch_open_issues(session, projectIds):
+        issuesByProject[row.Issue.project_id].append(row)
+
+    for projectDB in projectsDB:
+        report.projects.append(
+            generate_project_report(
+                projectDB,
+                stats.get(projectDB.id),
+                month,
+                issuesByProject[projectDB.id],
+            )
+        )
 
     return report
 
@@ -0,0 +1,152 @@
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import Date, Insert, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .models import Issue, IssueStatus, ProjectMonthlyStats
+from .session import create_session
+
+
+def month_start(day: date | datetime) -> date:
+    return date(day.year, day.month, 1)
+
+
+def bump_monthly_stats(
+    project_id: int, month: date, created: int = 0, closed: int = 0, opened: int = 0
+) -> Insert:
+    # Upsert adding the deltas to the month's row. A new row starts from the open
+    # count of the project's latest row so open always holds the current total
+    previousOpen = (
+        select(ProjectMonthlyStats.open)
+        .where(
+            ProjectMonthlyStats.project_id == project_id,
+            ProjectMonthlyStats.month < month,
+        )
+        .order_by(ProjectMonthlyStats.month.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    upsert = insert(ProjectMonthlyStats).values(
+        project_id=project_id,
+        month=month,
+        created=created,
+        closed=closed,
+        open=func.coalesce(previousOpen, 0) + opened,
+    )
+    return upsert.on_conflict_do_update(
+        index_elements=[ProjectMonthlyStats.project_id, ProjectMonthlyStats.month],
+        set_={
+            "created": ProjectMonthlyStats.created + created,
+            "closed": ProjectMonthlyStats.closed + closed,
+            "open": ProjectMonthlyStats.open + opened,
+        },
+    )
+
+
+IssueState = tuple[int, IssueStatus] | None
+
+
+def issue_stats_updates(
+    before: IssueState, after: IssueState, month: date
+) -> list[Insert]:
+    # Statements to run in the same transaction as an issue write
+    # before/after are the (project_id, status) of the issue, None when it is created/deleted
+    return issues_stats_updates([(before, after)], month)
+
+
+def issues_stats_updates(
+    changes: list[tuple[IssueState, IssueState]], month: date
+) -> list[Insert]:
+    # Same for several issue writes, with one upsert per project
+    deltas: dict[int, dict[str, int]] = defaultdict(
+        lambda: {"created": 0, "closed": 0, "opened": 0}
+    )
+    for before, after in changes:
+        if before is not None:
+            if before[1] == IssueStatus.OPEN:
+                deltas[before[0]]["opened"] -= 1
+        if after is not None:
+            if before is None:
+                deltas[after[0]]["created"] += 1
+            if after[1] == IssueStatus.OPEN:
+                deltas[after[0]]["opened"] += 1
+            if after[1] == IssueStatus.CLOSED and (
+                before is None or before[1] != IssueStatus.CLOSED
+            ):
+                deltas[after[0]]["closed"] += 1
+
+    return [
+        bump_monthly_stats(project_id, month, **delta)
+        for project_id, delta in deltas.items()
+        if any(delta.values())
+    ]
+
+
+def fetch_monthly_stats(
+    session: Session, project_ids: list[int], month: date
+) -> dict[int, ProjectMonthlyStats]:
+    # Latest row of each project up to the month, its open count is still current
+    # when the project had no activity this month
+    statsQuery = (
+        select(ProjectMonthlyStats)
+        .where(
+            ProjectMonthlyStats.project_id.in_(project_ids),
+            ProjectMonthlyStats.month <= month,
+        )
+        .order_by(ProjectMonthlyStats.project_id, ProjectMonthlyStats.month.desc())
+        .distinct(ProjectMonthlyStats.project_id)
+    )
+    return {
+        statsDB.project_id: statsDB for statsDB in session.execute(statsQuery).scalars()
+    }
+
+
+def backfill_monthly_stats(session: Session, today: date | None = None):
+    # Rebuilds every counter from the issues table. Issues don't keep their history,
+    # so closed uses the month of the last update of closed issues and open is only
+    # known for the current month, older rows are left at 0
+    month = month_start(today or date.today())
+    rows: dict[tuple[int, date], dict[str, int]] = defaultdict(
+        lambda: {"created": 0, "closed": 0, "open": 0}
+    )
+
+    createdMonth = func.date_trunc("month", Issue.created_at).cast(Date)
+    createdQuery = select(Issue.project_id, createdMonth, func.count()).group_by(
+        Issue.project_id, createdMonth
+    )
+    for project_id, createdAt, count in session.execute(createdQuery):
+        rows[(project_id, createdAt)]["created"] = count
+
+    closedMonth = func.date_trunc("month", Issue.updated_at).cast(Date)
+    closedQuery = (
+        select(Issue.project_id, closedMonth, func.count())
+        .where(Issue.status == IssueStatus.CLOSED)
+        .group_by(Issue.project_id, closedMonth)
+    )
+    for project_id, closedAt, count in session.execute(closedQuery):
+        rows[(project_id, closedAt)]["closed"] = count
+
+    openQuery = (
+        select(Issue.project_id, func.count())
+        .where(Issue.status == IssueStatus.OPEN)
+        .group_by(Issue.project_id)
+    )
+    for project_id, count in session.execute(openQuery):
+        rows[(project_id, month)]["open"] = count
+
+    session.execute(delete(ProjectMonthlyStats))
+    if rows:
+        session.execute(
+            insert(ProjectMonthlyStats),
+            [
+                {"project_id": project_id, "month": rowMonth, **counts}
+                for (project_id, rowMonth), counts in rows.items()
+            ],
+        )
+    session.commit()
+
+
+if __name__ == "__main__":
+    backfill_monthly_stats(create_session())
@@ -1,11 +1,26 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 
+# Sync engine is only used by Celery workers and Alembic
 engine = create_engine(settings.database.build_url(), pool_pre_ping=True, future=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+# The API uses the async engine so queries don't block the event loop
+async_engine = create_async_engine(
+    settings.database.build_async_url(), pool_pre_ping=True
+)
+# Objects are not expired on commit since reloading them would require an implicit await
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False
+)
+
 
 def create_session() -> Session:
     return SessionLocal()
+
+
+def create_async_session() -> AsyncSession:
+    return AsyncSessionLocal()
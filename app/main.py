@@ -1,14 +1,23 @@
+from contextlib import asynccontextmanager
+from time import perf_counter
 from uuid import uuid4
 
 import sentry_sdk
 from fastapi import FastAPI, Request
 
 from app.core.config import settings
-from app.core.metrics import inc_request_count
+from app.core.metrics import (
+    cleanup_dead_processes,
+    dec_requests_in_progress,
+    inc_request_count,
+    inc_requests_in_progress,
+    observe_request,
+)
 from app.core.monitoring import sentry_init
 
 from .api.routes_artifact import router as artifact_router
 from .api.routes_comment import router as comment_router
+from .api.routes_export import router as export_router
 from .api.routes_health import router as health_router
 from .api.routes_issue import router as issue_router
 from .api.routes_job import router as job_router
@@ -17,7 +26,16 @@ from .api.routes_project import router as project_router
 from .api.routes_sentry import router as sentry_router
 from .api.routes_user import router as user_router
 
-app = FastAPI(title="Flyswatter API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in every worker, drops the live gauges of workers that died since the
+    # server started. Files of previous runs are removed by reset_multiproc_dir
+    cleanup_dead_processes()
+    yield
+
+
+app = FastAPI(title="Flyswatter API", lifespan=lifespan)
 app.include_router(artifact_router)
 app.include_router(health_router)
 app.include_router(user_router)
@@ -27,6 +45,7 @@ app.include_router(issue_router)
 app.include_router(comment_router)
 app.include_router(sentry_router)
 app.include_router(job_router)
+app.include_router(export_router)
 
 sentry_init()
 
@@ -42,7 +61,13 @@ async def add_request_id(request: Request, call_next):
     if settings.sentry.sentry_dsn:
         with sentry_sdk.configure_scope() as scope:
             scope.set_tag("request_id", request_id)
-    response = await call_next(request)
+    start = perf_counter()
+    inc_requests_in_progress(request)
+    try:
+        response = await call_next(request)
+    finally:
+        dec_requests_in_progress(request)
     response.headers["X-Request-ID"] = request_id
     inc_request_count(request, response)
+    observe_request(request, response, perf_counter() - start)
     return response
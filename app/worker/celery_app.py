@@ -3,6 +3,26 @@ from celery import Celery
 from app.core.config import settings
 
 app = Celery(
-    "celery_app", broker=settings.redis.build_url(), backend=settings.redis.build_url()
+    "celery_app",
+    broker=settings.redis.build_url(),
+    backend=settings.worker.result_backend,
 )
 app.autodiscover_tasks(["app.worker"])
+app.conf.update(
+    task_ignore_result=settings.worker.ignore_result,
+    result_expires=settings.worker.result_expires,
+    worker_prefetch_multiplier=settings.worker.prefetch_multiplier,
+    task_acks_late=settings.worker.acks_late,
+    task_acks_on_failure_or_timeout=settings.worker.acks_on_failure_or_timeout,
+    task_reject_on_worker_lost=settings.worker.reject_on_worker_lost,
+    broker_transport_options={"visibility_timeout": settings.worker.visibility_timeout},
+)
+app.conf.task_routes = {
+    "app.worker.tasks.reconcile_job_counts": {"queue": "maintenance"}
+}
+app.conf.beat_schedule = {
+    "reconcile-job-counts": {
+        "task": "app.worker.tasks.reconcile_job_counts",
+        "schedule": settings.metrics.job_counts_reconcile_sec,
+    },
+}
@@ -1,23 +1,34 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.api.routes_common import apiMessages
 from app.artifacts.pdf_generator import monthly_report_pdf
-from app.blob.storage import upload
+from app.blob.storage import object_path, stored_url, upload_bytes
+from app.core.config import settings
 from app.core.errors import AppError, BlobError, ConnectionError, ExternalServiceError
+from app.core.job_counters import job_state_changed, write_job_counts
+from app.core.job_events import publish_job_event
 from app.core.monitoring import sentry_init
 from app.db.factory import create_artifact
 from app.db.models import Job, JobResultKind, JobState
-from app.db.monthly_report import generate_monthly_report
+from app.db.monthly_report import (
+    generate_monthly_report,
+    report_fingerprint,
+    report_inputs_query,
+)
+from app.db.monthly_stats import month_start
 from app.db.session import create_session
 
 from .celery_app import app
 
 sentry_init()
 
+# Part of the stored report names, bump it when the pdf layout changes
+REPORT_LAYOUT_VERSION = 1
+
 
 def fetch_task(session: Session, job_id: str) -> Job:
     jobQuery = select(Job).where(Job.public_id == job_id)
@@ -32,26 +43,54 @@ def fetch_task(session: Session, job_id: str) -> Job:
     return jobDB
 
 
-def start_task(session: Session, job: Job):
+def start_task(session: Session, job: Job) -> bool:
+    # Only queued jobs move to running. A finished job delivered again is skipped, a
+    # newer job for the same input may hold the unfinished slot by then. A job left
+    # running by a lost worker runs again as it is
+    if job.state not in (JobState.QUEUED, JobState.RUNNING):
+        return False
+    oldState = job.state
     job.state = JobState.RUNNING
     job.attempts += 1
     job.started_at = datetime.now()
     session.commit()
+    job_state_changed(job.job_type, oldState, job.state)
+    publish_job_event(job.public_id, job.state)
+    return True
+
+
+# Waits for its retry as queued, so the retry can start it again
+def requeue_task(session: Session, job: Job, e: AppError):
+    oldState = job.state
+    job.state = JobState.QUEUED
+    job.last_error = str(e)
+    job.error_kind = type(e).__name__
+    session.commit()
+    job_state_changed(job.job_type, oldState, job.state)
+    publish_job_event(job.public_id, job.state)
 
 
-def error_task(session: Session, job: Job, e: AppError):
+def error_task(session: Session, job: Job, e: Exception):
+    oldState = job.state
     job.state = JobState.FAILED
     job.last_error = str(e)
     job.error_kind = type(e).__name__
     session.commit()
+    job_state_changed(job.job_type, oldState, job.state)
+    publish_job_event(job.public_id, job.state)
 
 
-def succeed_task_artifact(session: Session, job: Job, artifactUrl: str):
+def succeed_task_artifact(
+    session: Session, job: Job, artifactUrl: str, expiresAt: datetime
+):
+    oldState = job.state
     job.state = JobState.SUCCEEDED
     job.result_kind = JobResultKind.ARTIFACT
-    newArtifact = create_artifact(job, url=artifactUrl)
+    newArtifact = create_artifact(job, url=artifactUrl, expires_at=expiresAt)
     session.add(newArtifact)
     session.commit()
+    job_state_changed(job.job_type, oldState, job.state)
+    publish_job_event(job.public_id, job.state)
 
 
 def finish_task(session: Session, job: Job):
@@ -62,6 +101,7 @@ def finish_task(session: Session, job: Job):
 # bind is required for retries
 # TODO add autoretry_for and set it to the errors that can occur here
 # retry_backoff will exponentially delay between retries
+# The job row holds the outcome, results follow CELERY_TASK_IGNORE_RESULT
 @app.task(
     bind=True,
     retry_backoff=True,
@@ -71,22 +111,60 @@ def finish_task(session: Session, job: Job):
 def generate_report(self, job_id: str, user_id: str):
     session = create_session()
     jobDB = fetch_task(session, job_id)
-    start_task(session, jobDB)
+    if not start_task(session, jobDB):
+        return
 
     try:
-        report = generate_monthly_report(session, user_id)
-        if report is None:
-            raise AppError(f"Monthly report not found for user {user_id}")
-        monthly_report_pdf(report, "output.pdf")
-        report_url = upload("output.pdf", "reports")
-
-        succeed_task_artifact(session, jobDB, report_url)
+        # Taken before signing so the artifact never claims more than the url lasts
+        expiresAt = datetime.now() + timedelta(seconds=settings.blob.url_ttl)
+        # Reports are stored under a fingerprint of their input, when nothing changed
+        # since the last one its url is signed again instead of building a new pdf.
+        # The input is read first so a stored pdf is never older than its name
+        inputs = session.execute(report_inputs_query(jobDB.user_id)).all()
+        fingerprint = report_fingerprint(month_start(datetime.today()), inputs)
+        reportName = f"{user_id}/{fingerprint}-v{REPORT_LAYOUT_VERSION}"
+        report_url = stored_url(object_path("reports", reportName, ".pdf"))
+        if report_url is None:
+            report = generate_monthly_report(session, user_id)
+            if report is None:
+                raise AppError(f"Monthly report not found for user {user_id}")
+            # Each task renders and uploads its own buffer, nothing is written to disk
+            reportPdf = monthly_report_pdf(report)
+            report_url = upload_bytes(
+                reportPdf, ".pdf", "reports", "application/pdf", reportName
+            )
+
+        succeed_task_artifact(session, jobDB, report_url, expiresAt)
 
     except (ConnectionError, ExternalServiceError) as e:
-        error_task(session, jobDB, e)
+        if self.request.retries < self.max_retries:
+            requeue_task(session, jobDB, e)
+        else:
+            error_task(session, jobDB, e)
+            finish_task(session, jobDB)
         raise e
 
-    except AppError as e:
+    # Anything unexpected, like an unreachable MinIO, still ends the job so identical
+    # requests don't keep attaching to it. A failed query leaves the session unusable
+    # until it is rolled back
+    except Exception as e:
+        session.rollback()
         error_task(session, jobDB, e)
         finish_task(session, jobDB)
         raise e
+
+
+# Scheduled by beat, rewrites the job counters served by /metrics from the jobs table
+@app.task(ignore_result=True)
+def reconcile_job_counts():
+    session = create_session()
+    try:
+        countsQuery = select(Job.state, Job.job_type, func.count()).group_by(
+            Job.state, Job.job_type
+        )
+        counts: dict[str, dict[str, int]] = {state: {} for state in JobState}
+        for state, job_type, count in session.execute(countsQuery):
+            counts[state][job_type] = count
+        write_job_counts(counts)
+    finally:
+        session.close()
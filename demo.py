@@ -15,6 +15,7 @@ from app.db.factory import (
     create_user,
 )
 from app.db.models import IssuePriority, IssueStatus, JobState
+from app.db.monthly_stats import backfill_monthly_stats
 from app.worker.tasks import generate_report
 
 
@@ -957,6 +958,13 @@ def seed_db():
     ]
     for issue in issues:
         demoSession.add(issue)
+    # Seeded issues bring their own keys, the counters continue after the highest one
+    # so the first issue created through the API doesn't reuse a key
+    for project in projects:
+        project.next_issue_number = 1 + max(
+            (int(issue.key) for issue in issues if issue.project is project),
+            default=0,
+        )
 
     # -----------------COMMENTS--------------------
     commentData = [
@@ -1244,6 +1252,8 @@ def seed_db():
 
     # Commiting database before running async tasks
     demoSession.commit()
+    # Seeded issues skip the counters the issue endpoints keep, reports read them
+    backfill_monthly_stats(demoSession)
     for job in reportJobs:
         generate_report.apply_async(
             args=[job.public_id, job.user.public_id], queue="pdfs"
@@ -0,0 +1,16 @@
+# Used when the API runs under gunicorn with uvicorn workers:
+# gunicorn app.main:app -k uvicorn.workers.UvicornWorker -w 4
+from prometheus_client import multiprocess
+
+from app.core.config import settings
+from app.core.metrics import reset_multiproc_dir
+
+
+# The master starts before any worker, metrics of the previous run are wiped here
+def on_starting(server):
+    reset_multiproc_dir()
+
+
+def child_exit(server, worker):
+    if settings.metrics.multiproc_dir:
+        multiprocess.mark_process_dead(worker.pid, settings.metrics.multiproc_dir)
@@ -1,14 +1,21 @@
 import os
 import subprocess
 import sys
-from unittest.mock import patch
+from contextlib import contextmanager
+from typing import Any
+from unittest.mock import MagicMock, patch
 
 import pytest
-from sqlalchemy import create_engine, event
-from sqlalchemy.orm import Session, sessionmaker
+from minio.error import S3Error
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy_utils import create_database, database_exists
 
-from app.api.routes_common import get_session
+from app.api.routes_common import get_session, get_session_maker
+from app.blob.storage import reset_clients
+from app.core.auth_cache import localCache
 from app.core.config import settings
 from app.core.errors import BlobError
 from app.db.base import Base  # your declarative Base
@@ -16,6 +23,7 @@ from app.main import app
 from app.worker.celery_app import app as celery_app
 
 TEST_DB_URL = settings.database.build_url()
+TEST_ASYNC_DB_URL = settings.database.build_async_url()
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -50,69 +58,116 @@ def apply_migrations():
 
 
 @pytest.fixture(scope="session")
-def connection(apply_migrations):
+def engine(apply_migrations):
     engine = create_engine(TEST_DB_URL, future=True)
+    yield engine
+    engine.dispose()
 
-    # Keep ONE DB connection open for the whole test session.
-    with engine.connect() as conn:
-        yield conn
 
+@pytest.fixture(scope="session")
+def async_engine(apply_migrations):
+    # TestClient runs every request in its own event loop and async connections
+    # can't be shared between loops, so connections are not pooled in tests
+    return create_async_engine(TEST_ASYNC_DB_URL, poolclass=NullPool)
 
-@pytest.fixture(autouse=True)
-def db_session(connection):
-    # In order to keep test transactions isolated
-    # We start a test wide transaction that should remain open until the end of the test
-    # However, session.commit() ends a transaction, so we need to wrap the test between
-    # a nested sub transaction, and restart every time session.commit() is called
-    # Once the test is over we can rollback the test wide transaction
-
-    trans = connection.begin()  # BEGIN
 
-    # Start a SAVEPOINT so the Session can use nested transactions
-    nested = connection.begin_nested()
+@pytest.fixture(autouse=True)
+def db_session(engine):
+    # The API uses an AsyncSession which can't join the transaction of a sync connection,
+    # so test data is really committed and both sessions see the same rows.
+    # Once the test is over every table is truncated to keep tests isolated
 
-    Session = sessionmaker(bind=connection, expire_on_commit=False, future=True)
+    Session = sessionmaker(bind=engine, expire_on_commit=False, future=True)
     testSession = Session()
 
-    # Listen to transaction end, ie session.commit()
-    # re-establish the SAVEPOINT so subsequent work is still isolated.
-    @event.listens_for(testSession, "after_transaction_end")
-    def _restart_savepoint(sess, trans_):
-        if not connection.in_nested_transaction():
-            connection.begin_nested()
-
     try:
         yield testSession
     finally:
         testSession.close()
-        try:
-            nested.close()
-        except Exception:
-            pass
-        # ROLLBACK
-        trans.rollback()
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        with engine.begin() as conn:
+            conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
         app.dependency_overrides.pop(get_session, None)
 
 
 @pytest.fixture(autouse=True)
-def override_db_session(db_session):
-    def _override():
-        return db_session
+def override_db_session(db_session, async_engine):
+    async def _override():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    def _override_maker():
+        return lambda: AsyncSession(async_engine, expire_on_commit=False)
 
     app.dependency_overrides[get_session] = _override
+    app.dependency_overrides[get_session_maker] = _override_maker
     try:
         yield
     finally:
         app.dependency_overrides.pop(get_session, None)
+        app.dependency_overrides.pop(get_session_maker, None)
+
+
+@pytest.fixture(autouse=True)
+def clear_auth_cache():
+    localCache.clear()
+    yield
+    localCache.clear()
+
+
+@pytest.fixture
+def query_budget(async_engine):
+    # Fails the test when the requests inside the block run more queries than budgeted
+    # Usage: with query_budget(2): c.get(...)
+    @contextmanager
+    def _budget(maxQueries: int):
+        statements = []
+
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", _count)
+        try:
+            yield statements
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", _count)
+        assert (
+            len(statements) <= maxQueries
+        ), f"{len(statements)} queries, budget is {maxQueries}:\n" + "\n".join(
+            statements
+        )
+
+    return _budget
+
+
+@pytest.fixture(autouse=True)
+def reset_blob_clients():
+    # Clients are process singletons, a mocked one must not leak into other tests
+    reset_clients()
+    yield
+    reset_clients()
+
+
+@pytest.fixture(autouse=True)
+def disable_entity_cache(monkeypatch):
+    # A redis shared between runs would serve entries that tests changed in the database,
+    # tests of the cache turn it back on against a fake redis
+    monkeypatch.setattr(settings.cache, "entity_ttl", 0)
 
 
 @pytest.fixture
 def mockMinIO():
     with patch("app.blob.storage.Minio") as mockMinio:
         mockMinio.return_value.presigned_get_object.return_value = "Mock.pdf"
+        # An empty bucket, so nothing is served from stored reports
+        mockMinio.return_value.stat_object.side_effect = no_such_key()
         yield mockMinIO
 
 
+def no_such_key() -> S3Error:
+    return S3Error(MagicMock(), "NoSuchKey", "Object does not exist", "", "", "")
+
+
 @pytest.fixture
 def mockMinIOFailure():
     with patch("app.blob.storage.Minio") as mockMinio:
@@ -131,3 +186,57 @@ def celery_conf():
         broker_connection_retry_on_startup=False,
     )
     yield
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append(lambda: self.redis.data.__setitem__(key, value))
+
+    def incr(self, key):
+        self.commands.append(
+            lambda: self.redis.data.__setitem__(
+                key, str(int(self.redis.data.get(key, b"0")) + 1).encode()
+            )
+        )
+
+    def hset(self, key, field, value):
+        self.commands.append(
+            lambda: self.redis.data.setdefault(key, {}).__setitem__(
+                field, value.encode()
+            )
+        )
+
+    def expire(self, key, seconds):
+        pass
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+
+
+# Just the commands the entity and auth caches use, without expiry
+class FakeRedis:
+    def __init__(self):
+        self.data: dict[str, Any] = {}
+
+    async def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    async def hget(self, key, field):
+        return self.data.get(key, {}).get(field)
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
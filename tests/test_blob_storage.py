@@ -1,8 +1,15 @@
+import os
+from unittest.mock import MagicMock, patch
+
 import pytest
+from minio.error import S3Error
 
-from app.blob.storage import upload
+from app.blob.storage import internal_client, stored_url, upload, upload_bytes
+from app.core.config import settings
 from app.core.errors import BlobError
 
+from .conftest import no_such_key
+
 
 def test_upload_success(mockMinIO):
     assert upload("bla.txt", "bla") == "Mock.pdf"
@@ -11,3 +18,81 @@ def test_upload_success(mockMinIO):
 def test_upload_bloberror(mockMinIOFailure):
     with pytest.raises(BlobError):
         upload("bla.txt", "bla")
+
+
+def test_uploadbytes_success():
+    with patch("app.blob.storage.Minio") as mockMinio:
+        mockMinio.return_value.presigned_get_object.return_value = "Mock.pdf"
+
+        assert upload_bytes(b"%PDF-1.3", ".pdf", "reports", "application/pdf") == (
+            "Mock.pdf"
+        )
+
+        _, dest_path, data, length = mockMinio.return_value.put_object.call_args.args
+        assert dest_path.startswith("reports/") and dest_path.endswith(".pdf")
+        assert data.read() == b"%PDF-1.3"
+        assert length == 8
+        assert mockMinio.return_value.put_object.call_args.kwargs == {
+            "content_type": "application/pdf"
+        }
+
+
+def test_uploadbytes_bloberror(mockMinIOFailure):
+    with pytest.raises(BlobError):
+        upload_bytes(b"%PDF-1.3", ".pdf", "reports")
+
+
+def test_uploadbytes_objectname():
+    with patch("app.blob.storage.Minio") as mockMinio:
+        mockMinio.return_value.presigned_get_object.return_value = "Mock.pdf"
+
+        upload_bytes(b"%PDF-1.3", ".pdf", "reports", "application/pdf", "abc/def")
+
+        _, dest_path, _, _ = mockMinio.return_value.put_object.call_args.args
+        assert dest_path == "reports/abc/def.pdf"
+
+
+def test_storedurl_success():
+    with patch("app.blob.storage.Minio") as mockMinio:
+        mockMinio.return_value.presigned_get_object.return_value = "Mock.pdf"
+
+        assert stored_url("reports/abc.pdf") == "Mock.pdf"
+        mockMinio.return_value.stat_object.side_effect = no_such_key()
+        assert stored_url("reports/abc.pdf") is None
+
+
+def test_storedurl_bloberror():
+    with patch("app.blob.storage.Minio") as mockMinio:
+        mockMinio.return_value.stat_object.side_effect = S3Error(
+            MagicMock(), "AccessDenied", "Access denied", "", "", ""
+        )
+
+        with pytest.raises(BlobError):
+            stored_url("reports/abc.pdf")
+
+
+def test_upload_reusesclients():
+    with patch("app.blob.storage.Minio") as mockMinio:
+        mockMinio.return_value.presigned_get_object.return_value = "Mock.pdf"
+
+        upload_bytes(b"first", ".txt", "bla")
+        upload_bytes(b"second", ".txt", "bla")
+
+        # one internal and one public client for the whole process
+        assert mockMinio.call_count == len(
+            {
+                (settings.blob.internal_endpoint, settings.blob.internal_secure),
+                (settings.blob.public_endpoint, settings.blob.public_secure),
+            }
+        )
+
+
+def test_upload_newclientsafterfork(monkeypatch):
+    with patch("app.blob.storage.Minio") as mockMinio:
+        mockMinio.side_effect = lambda *args, **kwargs: MagicMock()
+        parentClient = internal_client()
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+
+        assert internal_client() is not parentClient
+        assert internal_client() is internal_client()
+        assert mockMinio.call_count == 2
@@ -0,0 +1,222 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from redis.exceptions import ConnectionError
+
+from app.core import entity_cache
+from app.core.config import settings
+from app.core.entity_cache import cached_read, invalidate
+from app.db.factory import create_comment, create_issue, create_project, create_user
+from app.main import app
+
+from .conftest import FakeRedis
+from .test_routes_common import *
+
+
+class BrokenRedis:
+    async def mget(self, *keys):
+        raise ConnectionError()
+
+
+class Thing(BaseModel):
+    name: str
+
+
+@pytest.fixture
+def fakeRedis(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(settings.cache, "entity_ttl", 60)
+    monkeypatch.setattr(entity_cache, "get_async_redis", lambda: redis)
+    return redis
+
+
+def counting_load(names: list[str], calls: list[int]):
+    async def load():
+        calls.append(1)
+        return Thing(name=names[-1])
+
+    return load
+
+
+def test_cachedread_hitaftermiss(fakeRedis):
+    calls = []
+    names = ["first"]
+    load = counting_load(names, calls)
+
+    async def read_twice():
+        return [await cached_read("thing", "abc", Thing, load) for _ in range(2)]
+
+    results = asyncio.run(read_twice())
+
+    assert results == [Thing(name="first"), Thing(name="first")]
+    assert len(calls) == 1
+
+
+def test_cachedread_invalidatereloads(fakeRedis):
+    calls = []
+    names = ["first"]
+    load = counting_load(names, calls)
+
+    async def read_edit_read():
+        await cached_read("thing", "abc", Thing, load)
+        names.append("second")
+        await invalidate("thing", "abc")
+        return await cached_read("thing", "abc", Thing, load)
+
+    assert asyncio.run(read_edit_read()) == Thing(name="second")
+    assert len(calls) == 2
+
+
+def test_cachedread_racedwritenotserved(fakeRedis):
+    names = ["first"]
+
+    # The write commits and bumps the version while the old value is being loaded
+    async def racing_load():
+        loaded = Thing(name=names[-1])
+        names.append("second")
+        await invalidate("thing", "abc")
+        return loaded
+
+    async def read_twice():
+        await cached_read("thing", "abc", Thing, racing_load)
+        return await cached_read("thing", "abc", Thing, counting_load(names, []))
+
+    assert asyncio.run(read_twice()) == Thing(name="second")
+
+
+def test_cachedread_singleflight(fakeRedis):
+    calls = []
+
+    async def slow_load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return Thing(name="first")
+
+    async def read_concurrently():
+        return await asyncio.gather(
+            *[cached_read("thing", "abc", Thing, slow_load) for _ in range(5)]
+        )
+
+    results = asyncio.run(read_concurrently())
+
+    assert results == [Thing(name="first")] * 5
+    assert len(calls) == 1
+
+
+def test_cachedread_leadercancelled(fakeRedis):
+    calls = []
+
+    async def slow_load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return Thing(name="first")
+
+    async def read_concurrently():
+        leader = asyncio.create_task(cached_read("thing", "abc", Thing, slow_load))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(cached_read("thing", "abc", Thing, slow_load))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        # The leader's client went away while the others wait on its load
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        return leader, results
+
+    leader, results = asyncio.run(read_concurrently())
+
+    assert leader.cancelled()
+    assert results == [Thing(name="first")] * 3
+    # One waiter took over, the others waited on it
+    assert len(calls) == 2
+
+
+def test_cachedread_redisdown(monkeypatch):
+    monkeypatch.setattr(settings.cache, "entity_ttl", 60)
+    monkeypatch.setattr(entity_cache, "get_async_redis", lambda: BrokenRedis())
+    calls = []
+    load = counting_load(["first"], calls)
+
+    async def read_twice():
+        return [await cached_read("thing", "abc", Thing, load) for _ in range(2)]
+
+    assert asyncio.run(read_twice()) == [Thing(name="first")] * 2
+    assert len(calls) == 2
+
+
+def test_readissue_cached(db_session, fakeRedis, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password, admin=True)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    db_session.add(issueDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+
+    c.get(f"/issue/{issueDB.public_id}", headers=headers)
+    # Only auth, the issue and its validators come from the cache
+    with query_budget(1):
+        r = c.get(f"/issue/{issueDB.public_id}", headers=headers)
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["key"] == "PROJ-1"
+    with query_budget(1):
+        notModifiedR = c.get(
+            f"/issue/{issueDB.public_id}",
+            headers={**headers, "If-None-Match": r.headers["ETag"]},
+        )
+    assert notModifiedR.status_code == status.HTTP_304_NOT_MODIFIED
+
+    r = c.post(
+        "/project/edit",
+        headers=headers,
+        json={
+            "id": projectDB.public_id,
+            "title": projectDB.title,
+            "key": "BUGS",
+            "author": userDB.username,
+            "created_at": "",
+        },
+    )
+    assert r.status_code == status.HTTP_200_OK
+    r = c.get(
+        f"/issue/{issueDB.public_id}",
+        headers={**headers, "If-None-Match": notModifiedR.headers["ETag"]},
+    )
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["key"] == "BUGS-1"
+
+
+def test_readcomment_cached(db_session, fakeRedis, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    db_session.add(issueDB)
+    commentDB = create_comment(issueDB, userDB)
+    db_session.add(commentDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+
+    r = c.get(f"/comment/{commentDB.public_id}", headers=headers)
+    with query_budget(1):
+        notModifiedR = c.get(
+            f"/comment/{commentDB.public_id}",
+            headers={**headers, "If-Modified-Since": r.headers["Last-Modified"]},
+        )
+
+    assert notModifiedR.status_code == status.HTTP_304_NOT_MODIFIED
+    assert notModifiedR.headers["ETag"] == r.headers["ETag"]
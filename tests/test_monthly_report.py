@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.db.factory import create_issue, create_project, create_user
+from app.db.models import IssueStatus
+from app.db.monthly_report import generate_monthly_report
+from app.db.monthly_stats import backfill_monthly_stats
+
+from .conftest import db_session
+
+
+def test_generatemonthlyreport_counts(db_session, engine):
+    owner = create_user(username="jdoeowner", email="owner@jdoe.com")
+    other = create_user(username="jdoeother", email="other@jdoe.com")
+    db_session.add_all([owner, other])
+    projectDB = create_project(owner)
+    emptyProjectDB = create_project(owner, title="Empty Project", key="EMPT")
+    db_session.add_all([projectDB, emptyProjectDB])
+
+    lastMonth = datetime.today() - timedelta(days=40)
+    db_session.add_all(
+        [
+            create_issue(projectDB, owner, owner, title="Issue 1", key=1),
+            create_issue(projectDB, other, other, title="Issue 2", key=2),
+            create_issue(
+                projectDB,
+                owner,
+                other,
+                title="Issue 3",
+                key=3,
+                created_at=lastMonth,
+                updated_at=lastMonth,
+            ),
+            create_issue(
+                projectDB,
+                owner,
+                owner,
+                title="Issue 4",
+                key=4,
+                status=IssueStatus.CLOSED,
+            ),
+            create_issue(
+                projectDB,
+                owner,
+                owner,
+                title="Issue 5",
+                key=5,
+                status=IssueStatus.CLOSED,
+                created_at=lastMonth,
+                updated_at=lastMonth,
+            ),
+        ]
+    )
+    db_session.commit()
+    backfill_monthly_stats(db_session)
+
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        report = generate_monthly_report(db_session, owner.public_id)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    # user, projects, counters and open issues, whatever the number of issues
+    assert len(statements) == 4
+
+    assert [project.name for project in report.projects] == [
+        "Test Project",
+        "Empty Project",
+    ]
+    projectReport = report.projects[0]
+    assert projectReport.open_issues == 3
+    assert projectReport.created_issues_month == 3
+    assert projectReport.closed_issues_month == 1
+
+    issuesByUser = {
+        userReport.username: [issue.key for issue in userReport.open_issues]
+        for userReport in projectReport.user_issues
+    }
+    assert issuesByUser == {"jdoeowner": ["PROJ-1"], "jdoeother": ["PROJ-2", "PROJ-3"]}
+    assert projectReport.user_issues[0].open_issues[0].creator == "jdoeother"
+
+    emptyReport = report.projects[1]
+    assert emptyReport.open_issues == 0
+    assert emptyReport.user_issues == []
@@ -7,6 +7,7 @@ from sqlalchemy import insert, select
 from app.api.dto import CommentCreate, CommentEditIn, CommentEditOut, CommentRead
 from app.api.routes_common import Token, apiMessages
 from app.core.config import settings
+from app.db.factory import create_comment, create_issue, create_project, create_user
 from app.db.models import Comment, Issue, IssuePriority, IssueStatus, Project, User
 from app.main import app
 
@@ -39,7 +40,7 @@ def test_createcomment_success(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -101,7 +102,7 @@ def test_createcomment_issuenotfound(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -150,7 +151,7 @@ def test_readcomment_success(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -187,6 +188,39 @@ def test_readcomment_success(db_session):
     assert data.created_at is not None
 
 
+def test_readcomment_notmodified(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    db_session.add(issueDB)
+    commentDB = create_comment(issueDB, userDB, updated_at=datetime(2025, 1, 1))
+    db_session.add(commentDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+
+    r = c.get(f"/comment/{commentDB.public_id}", headers=headers)
+    lastModified = r.headers["Last-Modified"]
+    notModifiedR = c.get(
+        f"/comment/{commentDB.public_id}",
+        headers={**headers, "If-Modified-Since": lastModified},
+    )
+    olderR = c.get(
+        f"/comment/{commentDB.public_id}",
+        headers={**headers, "If-Modified-Since": "Tue, 31 Dec 2024 00:00:00 GMT"},
+    )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert notModifiedR.status_code == status.HTTP_304_NOT_MODIFIED
+    assert notModifiedR.headers["ETag"] == r.headers["ETag"]
+    assert olderR.status_code == status.HTTP_200_OK
+
+
 def test_readcomment_commentnotfound(db_session):
     c = TestClient(app)
     userDB = User(
@@ -212,7 +246,7 @@ def test_readcomment_commentnotfound(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -238,14 +272,222 @@ def test_readcomment_commentnotfound(db_session):
     assert r.json()["detail"] == apiMessages.comment_not_found
 
 
-def xtest_readusercomments_success(db_session):
+def test_bulkcomments_success(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    otherIssueDB = create_issue(projectDB, userDB, userDB, title="Other", key=2)
+    db_session.add_all([issueDB, otherIssueDB])
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.post(
+        "/comment/bulk",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+        json={
+            "comments": [
+                {"issue_id": issueDB.public_id, "body": "First"},
+                {"issue_id": "invalidId", "body": "Lost"},
+                {"issue_id": otherIssueDB.public_id, "body": "Second"},
+            ]
+        },
+    )
+
+    results = r.json()["results"]
+    assert r.status_code == status.HTTP_200_OK
+    assert results[1] == {"id": None, "error": apiMessages.issue_not_found}
+    commentsDB = {
+        commentDB.public_id: commentDB
+        for commentDB in db_session.execute(select(Comment)).scalars()
+    }
+    assert len(commentsDB) == 2
+    assert commentsDB[results[0]["id"]].body == "First"
+    assert commentsDB[results[0]["id"]].issue_id == issueDB.id
+    assert commentsDB[results[2]["id"]].body == "Second"
+    assert commentsDB[results[2]["id"]].author_id == userDB.id
+
+
+def test_bulkcomments_querybudget(db_session, query_budget):
     c = TestClient(app)
-    assert False
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issuesDB = [
+        create_issue(projectDB, userDB, userDB, title=f"Issue {key}", key=key)
+        for key in range(1, 4)
+    ]
+    db_session.add_all(issuesDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+    comments = [
+        {"issue_id": issuesDB[i % 3].public_id, "body": f"Comment {i}"}
+        for i in range(200)
+    ]
+
+    # auth + issues + insert
+    with query_budget(3):
+        r = c.post(
+            "/comment/bulk",
+            headers={"Authorization": f"Bearer {token.access_token}"},
+            json={"comments": comments},
+        )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert all(result["id"] for result in r.json()["results"])
+    assert len(db_session.execute(select(Comment)).scalars().all()) == 200
 
 
-def xtest_readusercomments_commentnotfound(db_session):
+def test_readusercomments_success(db_session):
     c = TestClient(app)
-    assert False
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    anotherUserDB = create_user(username="anotheruser", email="another@jdoe.com")
+    db_session.add_all([userDB, anotherUserDB])
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    db_session.add(issueDB)
+    db_session.add_all(
+        [
+            create_comment(
+                issueDB, userDB, body="First", created_at=datetime(2025, 1, 1)
+            ),
+            create_comment(
+                issueDB, anotherUserDB, body="Other", created_at=datetime(2025, 1, 2)
+            ),
+            create_comment(
+                issueDB, userDB, body="Second", created_at=datetime(2025, 1, 3)
+            ),
+        ]
+    )
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/comment/mine",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert [c["body"] for c in r.json()["items"]] == ["Second", "First"]
+    assert r.json()["items"][0]["issue_id"] == issueDB.public_id
+    assert r.json()["items"][0]["author_id"] == userDB.public_id
+
+
+def test_readusercomments_empty(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    db_session.add(create_user(username=login, password=password))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/comment/mine",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json() == {"items": [], "next_cursor": None}
+
+
+def test_readissuecomments_pagination(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    otherIssueDB = create_issue(projectDB, userDB, userDB, title="Other", key=2)
+    db_session.add_all([issueDB, otherIssueDB])
+    for day in range(1, 4):
+        db_session.add(
+            create_comment(
+                issueDB,
+                userDB,
+                body=f"Comment {day}",
+                created_at=datetime(2025, 1, day),
+            )
+        )
+    db_session.add(create_comment(otherIssueDB, userDB, body="Elsewhere"))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    firstR = c.get(
+        f"/comment/issue/{issueDB.public_id}",
+        params={"limit": 2},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+    secondR = c.get(
+        f"/comment/issue/{issueDB.public_id}",
+        params={"limit": 2, "cursor": firstR.json()["next_cursor"]},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert firstR.status_code == status.HTTP_200_OK
+    assert [c["body"] for c in firstR.json()["items"]] == ["Comment 1", "Comment 2"]
+    assert secondR.status_code == status.HTTP_200_OK
+    assert [c["body"] for c in secondR.json()["items"]] == ["Comment 3"]
+    assert secondR.json()["next_cursor"] is None
+
+
+def test_readissuecomments_querybudget(db_session, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    authors = [
+        create_user(username=f"author{i}", email=f"author{i}@jdoe.com")
+        for i in range(3)
+    ]
+    db_session.add_all(authors)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    db_session.add(issueDB)
+    for i in range(12):
+        db_session.add(create_comment(issueDB, authors[i % 3], body=f"Comment {i}"))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    # auth + comments with their issue + one batch for the authors
+    with query_budget(3):
+        r = c.get(
+            f"/comment/issue/{issueDB.public_id}",
+            headers={"Authorization": f"Bearer {token.access_token}"},
+        )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert len(r.json()["items"]) == 12
+
+
+def test_readissuecomments_issuenotfound(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    db_session.add(create_user(username=login, password=password))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/comment/issue/invalidId",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_409_CONFLICT
+    assert r.json()["detail"] == apiMessages.issue_not_found
 
 
 def test_editcomment_success(db_session):
@@ -273,7 +515,7 @@ def test_editcomment_success(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -339,7 +581,7 @@ def test_editcomment_commentnotfound(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -394,7 +636,7 @@ def test_editcomment_usernotauthor(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -448,7 +690,7 @@ def test_deletecomment_success(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -498,7 +740,7 @@ def test_deletecomment_commentnotfound(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
@@ -549,7 +791,7 @@ def test_deletecomment_usernotauthor(db_session):
     issueDB = Issue(
         id=None,
         title="New Issue",
-        key="1",
+        key=1,
         description="An issue has been found",
         status=IssueStatus.OPEN,
         priority=IssuePriority.MEDIUM,
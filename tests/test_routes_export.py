@@ -0,0 +1,93 @@
+import json
+from uuid import uuid4
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.api.dto import IssueRead, JobRead, UserRead
+from app.api.routes_common import apiMessages
+from app.db.factory import create_issue, create_job, create_project, create_user
+from app.main import app
+
+from .conftest import db_session
+from .test_routes_common import get_test_token
+
+
+def test_exportusers_success(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password, admin=True)
+    anotherUserDB = create_user(username="anotheruser", email="another@test.com")
+    db_session.add(userDB)
+    db_session.add(anotherUserDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/export/users", headers={"Authorization": f"Bearer {token.access_token}"}
+    )
+    data = [UserRead(**json.loads(line)) for line in r.text.splitlines()]
+
+    assert r.status_code == status.HTTP_200_OK
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert [user.username for user in data] == [login, "anotheruser"]
+
+
+def test_exportissues_success(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password, admin=True)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    db_session.add(create_issue(projectDB, userDB, userDB, key=1))
+    db_session.add(create_issue(projectDB, userDB, userDB, key=2, title="Other"))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/export/issues", headers={"Authorization": f"Bearer {token.access_token}"}
+    )
+    data = [IssueRead(**json.loads(line)) for line in r.text.splitlines()]
+
+    assert r.status_code == status.HTTP_200_OK
+    assert [issue.key for issue in data] == ["PROJ-1", "PROJ-2"]
+    assert all(issue.project_id == projectDB.public_id for issue in data)
+
+
+def test_exportjobs_success(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password, admin=True)
+    db_session.add(userDB)
+    jobDB = create_job(userDB, idempotency_key=uuid4().hex)
+    db_session.add(jobDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get("/export/jobs", headers={"Authorization": f"Bearer {token.access_token}"})
+    data = [JobRead(**json.loads(line)) for line in r.text.splitlines()]
+
+    assert r.status_code == status.HTTP_200_OK
+    assert len(data) == 1
+    assert data[0].id == jobDB.public_id
+    assert data[0].user_id == userDB.public_id
+
+
+def test_exportusers_usernotadmin(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    db_session.add(create_user(username=login, password=password))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/export/users", headers={"Authorization": f"Bearer {token.access_token}"}
+    )
+
+    assert r.status_code == status.HTTP_403_FORBIDDEN
+    assert r.json()["detail"] == apiMessages.requires_admin
@@ -0,0 +1,250 @@
+import asyncio
+from types import SimpleNamespace
+from uuid import uuid4
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.api.dto import JobRead
+from app.api.routes_common import apiMessages
+from app.core import job_events
+from app.db.factory import create_artifact, create_job, create_user
+from app.db.models import JobState
+from app.main import app
+
+from .conftest import db_session
+from .test_routes_common import get_test_token
+
+
+def test_readalljobs_querybudget(db_session, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    for _ in range(5):
+        jobDB = create_job(
+            userDB, idempotency_key=uuid4().hex, state=JobState.SUCCEEDED
+        )
+        db_session.add(jobDB)
+        db_session.add(create_artifact(jobDB, url="Mock.pdf"))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    # auth + jobs page, relationships are joined
+    with query_budget(2):
+        r = c.get(
+            "/jobs/all", headers={"Authorization": f"Bearer {token.access_token}"}
+        )
+    data = [JobRead(**job) for job in r.json()["items"]]
+
+    assert r.status_code == status.HTTP_200_OK
+    assert len(data) == 5
+    assert all(job.user_id == userDB.public_id for job in data)
+    assert all(job.artifact_id is not None for job in data)
+
+
+def test_readallartifacts_querybudget(db_session, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    for _ in range(5):
+        jobDB = create_job(userDB, idempotency_key=uuid4().hex)
+        db_session.add(jobDB)
+        db_session.add(create_artifact(jobDB, url="Mock.pdf"))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    with query_budget(2):
+        r = c.get(
+            "/artifacts/all",
+            headers={"Authorization": f"Bearer {token.access_token}"},
+        )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert len(r.json()["items"]) == 5
+
+
+def test_readjob_notmodified(db_session, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    jobDB = create_job(userDB, state=JobState.RUNNING)
+    db_session.add(jobDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+    headers = {"Authorization": f"Bearer {token.access_token}"}
+
+    r = c.get(f"/jobs/{jobDB.public_id}", headers=headers)
+    etag = r.headers["ETag"]
+    # auth + updated_at lookup, the job isn't loaded
+    with query_budget(2):
+        notModifiedR = c.get(
+            f"/jobs/{jobDB.public_id}", headers={**headers, "If-None-Match": etag}
+        )
+    jobDB.state = JobState.SUCCEEDED
+    db_session.commit()
+    modifiedR = c.get(
+        f"/jobs/{jobDB.public_id}", headers={**headers, "If-None-Match": etag}
+    )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert etag.startswith('W/"')
+    assert notModifiedR.status_code == status.HTTP_304_NOT_MODIFIED
+    assert notModifiedR.headers["ETag"] == etag
+    assert notModifiedR.content == b""
+    assert modifiedR.status_code == status.HTTP_200_OK
+    assert modifiedR.headers["ETag"] != etag
+    assert modifiedR.json()["status"] == JobState.SUCCEEDED
+
+
+class FakePubSub:
+    # Runs on_message the first time it is read, like a worker finishing the job
+    def __init__(self, on_message):
+        self.on_message = on_message
+
+    async def subscribe(self, channel):
+        self.channel = channel
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        if self.on_message is None:
+            await asyncio.sleep(timeout)
+            return None
+        self.on_message()
+        self.on_message = None
+        return {"type": "message", "channel": self.channel, "data": b"succeeded"}
+
+    async def aclose(self):
+        pass
+
+
+def fake_job_events(monkeypatch, on_message=None):
+    fakeRedis = SimpleNamespace(pubsub=lambda: FakePubSub(on_message))
+    monkeypatch.setattr(job_events, "get_async_redis", lambda: fakeRedis)
+
+
+def test_readjob_longpollfinished(db_session, query_budget, monkeypatch):
+    fake_job_events(monkeypatch)
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    jobDB = create_job(userDB, state=JobState.SUCCEEDED)
+    db_session.add(jobDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    # auth + state lookup + job, no waiting
+    with query_budget(3):
+        r = c.get(
+            f"/jobs/{jobDB.public_id}",
+            params={"wait": 30},
+            headers={"Authorization": f"Bearer {token.access_token}"},
+        )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["status"] == JobState.SUCCEEDED
+
+
+def test_readjob_longpollwokenbyevent(db_session, monkeypatch):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    jobDB = create_job(userDB, state=JobState.RUNNING)
+    db_session.add(jobDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    def finish_job():
+        jobDB.state = JobState.SUCCEEDED
+        db_session.commit()
+
+    fake_job_events(monkeypatch, finish_job)
+    r = c.get(
+        f"/jobs/{jobDB.public_id}/result",
+        params={"wait": 30},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_200_OK
+
+
+def test_readjob_longpolltimeout(db_session, monkeypatch):
+    fake_job_events(monkeypatch)
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    jobDB = create_job(userDB, state=JobState.RUNNING)
+    db_session.add(jobDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        f"/jobs/{jobDB.public_id}",
+        params={"wait": 1},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["status"] == JobState.RUNNING
+
+
+def test_readjobevents_success(db_session, monkeypatch):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    jobDB = create_job(userDB, state=JobState.RUNNING)
+    db_session.add(jobDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    def finish_job():
+        jobDB.state = JobState.SUCCEEDED
+        db_session.commit()
+
+    fake_job_events(monkeypatch, finish_job)
+    with c.stream(
+        "GET",
+        f"/jobs/{jobDB.public_id}/events",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    ) as r:
+        events = [
+            JobRead.model_validate_json(line.removeprefix("data: "))
+            for line in r.iter_lines()
+            if line.startswith("data: ")
+        ]
+
+    assert r.status_code == status.HTTP_200_OK
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert [event.status for event in events] == [
+        JobState.RUNNING,
+        JobState.SUCCEEDED,
+    ]
+
+
+def test_readjobevents_jobnotfound(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    db_session.add(create_user(username=login, password=password))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/jobs/invalidId/events",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_409_CONFLICT
+    assert r.json()["detail"] == apiMessages.job_not_found
@@ -0,0 +1,144 @@
+import os
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+import app.core.metrics as metrics
+from app.core.config import settings
+from app.core.metrics import (
+    cleanup_dead_processes,
+    clear_jobs_gauges,
+    metrics_registry,
+    render_metrics,
+    reset_multiproc_dir,
+)
+from app.db.models import JobState
+from app.main import app
+
+
+def test_metrics_jobcounts(query_budget, monkeypatch):
+    import app.api.routes_metrics as routes_metrics
+
+    async def _read_job_counts(states):
+        return {
+            JobState.SUCCEEDED: {"generate-report": 3},
+            JobState.QUEUED: {"generate-report": 1},
+            JobState.FAILED: {},
+        }
+
+    monkeypatch.setattr(routes_metrics, "read_job_counts", _read_job_counts)
+    c = TestClient(app)
+
+    with query_budget(0):
+        r = c.get("/metrics")
+
+    assert r.status_code == status.HTTP_200_OK
+    assert 'jobs_succeeded_total{type="generate-report"} 3.0' in r.text
+    assert 'jobs_enqueued_total{type="generate-report"} 1.0' in r.text
+    assert "jobs_failed_total{" not in r.text
+
+
+def test_metrics_countersunavailable(monkeypatch):
+    import app.api.routes_metrics as routes_metrics
+
+    async def _read_job_counts(states):
+        return None
+
+    monkeypatch.setattr(routes_metrics, "read_job_counts", _read_job_counts)
+    c = TestClient(app)
+
+    r = c.get("/metrics")
+
+    assert r.status_code == status.HTTP_200_OK
+
+
+def test_metrics_requestlatency(db_session):
+    c = TestClient(app)
+    labels = {"method": "GET", "endpoint": "/project/{project_id}", "status": "401"}
+    before = (
+        REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) or 0
+    )
+
+    r = c.get("/project/someProjectId")
+
+    assert r.status_code == status.HTTP_401_UNAUTHORIZED
+    assert (
+        REGISTRY.get_sample_value("http_request_duration_seconds_count", labels)
+        == before + 1
+    )
+    assert (
+        REGISTRY.get_sample_value("http_requests_in_progress", {"method": "GET"}) == 0
+    )
+    assert (
+        REGISTRY.get_sample_value(
+            "http_response_size_bytes_count",
+            {"method": "GET", "endpoint": "/project/{project_id}"},
+        )
+        is not None
+    )
+
+
+def test_metrics_excludedpath():
+    c = TestClient(app)
+    labels = {"method": "GET", "endpoint": "/health", "status": "200"}
+
+    r = c.get("/health")
+
+    assert r.status_code == status.HTTP_200_OK
+    assert (
+        REGISTRY.get_sample_value("http_request_duration_seconds_count", labels) is None
+    )
+
+
+def test_cleanupdeadprocesses_removesdeadlivegauges(tmp_path, monkeypatch):
+    deadPid = 4194305  # above the kernel pid_max, never alive
+    for filename in [
+        f"gauge_livesum_{deadPid}.db",
+        f"counter_{deadPid}.db",
+        f"gauge_livesum_{os.getpid()}.db",
+    ]:
+        (tmp_path / filename).write_bytes(b"")
+    monkeypatch.setattr(settings.metrics, "multiproc_dir", str(tmp_path))
+
+    cleanup_dead_processes()
+
+    assert sorted(f.name for f in tmp_path.iterdir()) == [
+        f"counter_{deadPid}.db",
+        f"gauge_livesum_{os.getpid()}.db",
+    ]
+
+
+def test_metrics_multiprocessregistry(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.metrics, "multiproc_dir", str(tmp_path))
+
+    assert metrics_registry() is not REGISTRY
+    assert render_metrics() == b""
+
+
+def test_resetmultiprocdir_removesallfiles(tmp_path, monkeypatch):
+    # A restarted container reuses the pids of the previous run
+    for filename in [f"gauge_livesum_{os.getpid()}.db", "counter_1.db", "keep.txt"]:
+        (tmp_path / filename).write_bytes(b"")
+    monkeypatch.setattr(settings.metrics, "multiproc_dir", str(tmp_path))
+
+    reset_multiproc_dir()
+
+    assert [f.name for f in tmp_path.iterdir()] == ["keep.txt"]
+
+
+def test_clearjobsgauges_multiprocesszeroes(tmp_path, monkeypatch):
+    staleFamily = GaugeMetricFamily("jobs_failed_total", "Jobs Failed", labels=["type"])
+    staleFamily.add_metric(["export"], 3)
+
+    class StaleFiles:
+        def collect(self):
+            return [staleFamily]
+
+    monkeypatch.setattr(settings.metrics, "multiproc_dir", str(tmp_path))
+    monkeypatch.setattr(metrics, "metrics_registry", lambda: StaleFiles())
+
+    clear_jobs_gauges()
+
+    assert REGISTRY.get_sample_value("jobs_failed_total", {"type": "export"}) == 0
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 from fastapi import status
 from fastapi.testclient import TestClient
@@ -7,7 +7,8 @@ from sqlalchemy import insert, select
 from app.api.dto import ProjectCreate, ProjectEdit, ProjectRead
 from app.api.routes_common import Token, apiMessages
 from app.core.config import settings
-from app.db.models import Project, User
+from app.db.factory import create_project, create_user
+from app.db.models import Project, ProjectMonthlyStats, User
 from app.main import app
 
 from .conftest import db_session
@@ -203,17 +204,18 @@ def test_readuserprojects_success(db_session):
     login = userDB.username
     password = "AAAAAAA"  # matches hashed
     token = get_test_token(c, login, password)
+    # Newest projects come first
     toExpect = [
         ProjectRead(
-            title="Test Project",
-            key="PROJ",
+            title="Another Project",
+            key="ANOT",
             id="",
             author=userDB.username,
             created_at="",
         ),
         ProjectRead(
-            title="Another Project",
-            key="ANOT",
+            title="Test Project",
+            key="PROJ",
             id="",
             author=userDB.username,
             created_at="",
@@ -224,7 +226,7 @@ def test_readuserprojects_success(db_session):
         f"/project/mine",
         headers={"Authorization": f"Bearer {token.access_token}"},
     )
-    data = [ProjectRead.model_validate(d) for d in r.json()]
+    data = [ProjectRead.model_validate(d) for d in r.json()["items"]]
 
     assert r.status_code == status.HTTP_200_OK
     assert len(data) == len(toExpect)
@@ -234,6 +236,148 @@ def test_readuserprojects_success(db_session):
         assert project.key == expected.key
 
 
+def test_readuserprojects_querybudget(db_session, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    db_session.add(create_project(userDB, title="Test Project", key="PROJ"))
+    db_session.add(create_project(userDB, title="Another Project", key="ANOT"))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    with query_budget(2):
+        r = c.get(
+            f"/project/mine",
+            headers={"Authorization": f"Bearer {token.access_token}"},
+        )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert len(r.json()["items"]) == 2
+
+
+def test_readuserprojects_pagination(db_session):
+    c = TestClient(app)
+    userDB = User(
+        id=None,
+        username="jdoetestuser",
+        email="jdoetestuser@test.com",
+        name="John Doe Test",
+        pass_hash="$2b$12$C/ZIa0h6IbTLG0aR1lkzCu0S26wbELjeNkFv/frObFmuVYrBPkgzO",
+        admin=True,
+    )
+    db_session.add(userDB)
+    db_session.add(Project(id=None, title="Test Project", key="PROJ", author=userDB))
+    db_session.add(Project(id=None, title="Another Project", key="ANOT", author=userDB))
+    db_session.add(Project(id=None, title="Third Project", key="THIR", author=userDB))
+    db_session.commit()
+    login = userDB.username
+    password = "AAAAAAA"  # matches hashed
+    token = get_test_token(c, login, password)
+
+    firstR = c.get(
+        f"/project/mine",
+        params={"limit": 2},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+    secondR = c.get(
+        f"/project/mine",
+        params={"limit": 2, "cursor": firstR.json()["next_cursor"]},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert firstR.status_code == status.HTTP_200_OK
+    assert [p["key"] for p in firstR.json()["items"]] == ["THIR", "ANOT"]
+    assert firstR.json()["next_cursor"] is not None
+    assert secondR.status_code == status.HTTP_200_OK
+    assert [p["key"] for p in secondR.json()["items"]] == ["PROJ"]
+    assert secondR.json()["next_cursor"] is None
+
+
+def test_readuserprojects_invalidcursor(db_session):
+    c = TestClient(app)
+    userDB = User(
+        id=None,
+        username="jdoetestuser",
+        email="jdoetestuser@test.com",
+        name="John Doe Test",
+        pass_hash="$2b$12$C/ZIa0h6IbTLG0aR1lkzCu0S26wbELjeNkFv/frObFmuVYrBPkgzO",
+        admin=True,
+    )
+    db_session.add(userDB)
+    db_session.commit()
+    login = userDB.username
+    password = "AAAAAAA"  # matches hashed
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        f"/project/mine",
+        params={"cursor": "Invalid"},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_400_BAD_REQUEST
+    assert r.json()["detail"] == apiMessages.invalid_cursor
+
+
+def test_readprojectstats_success(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    db_session.flush()
+    db_session.add_all(
+        [
+            ProjectMonthlyStats(
+                project_id=projectDB.id,
+                month=date(2025, 9, 1),
+                created=4,
+                closed=1,
+                open=3,
+            ),
+            ProjectMonthlyStats(
+                project_id=projectDB.id,
+                month=date(2025, 10, 1),
+                created=2,
+                closed=3,
+                open=2,
+            ),
+        ]
+    )
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        f"/project/stats/{projectDB.public_id}",
+        params={"months": 1},
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json() == [{"month": "2025-10", "created": 2, "closed": 3, "open": 2}]
+
+
+def test_readprojectstats_projectnotfound(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    db_session.add(create_user(username=login, password=password))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    r = c.get(
+        "/project/stats/invalidId",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert r.status_code == status.HTTP_409_CONFLICT
+    assert r.json()["detail"] == apiMessages.project_not_found
+
+
 def test_editproject_success(db_session):
     c = TestClient(app)
     userDB = User(
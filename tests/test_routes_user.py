@@ -1,17 +1,30 @@
-from datetime import datetime
+import asyncio
+import threading
+from datetime import datetime, timedelta
 from uuid import uuid4
 
+import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
 from freezegun import freeze_time
-from sqlalchemy import insert, select
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 from app.api.dto import UserCreate, UserEdit, UserRead, UserReport
 from app.api.routes_common import Token, apiMessages
+from app.api.routes_user import queue_report_job
 from app.core.config import settings
 from app.core.security import get_token_payload
-from app.db.factory import create_issue, create_job, create_project, create_user
+from app.db.factory import (
+    create_artifact,
+    create_issue,
+    create_job,
+    create_project,
+    create_user,
+)
 from app.db.models import Job, JobResultKind, JobState, RefreshToken, User
+from app.db.session import create_async_session
 from app.main import app
 
 from .conftest import db_session
@@ -163,6 +176,35 @@ def test_login_invalidpassword(db_session):
     assert r.json()["detail"] == apiMessages.login_fail
 
 
+def test_login_serverbusy(db_session, monkeypatch):
+    import app.core.security as security
+
+    fullSlots = threading.BoundedSemaphore(1)
+    fullSlots.acquire()
+    monkeypatch.setattr(security, "hash_slots", fullSlots)
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"  # matches hashed
+    db_session.add(
+        User(
+            id=None,
+            username=login,
+            email="jdoetestuser@test.com",
+            name="John Doe Test",
+            pass_hash="$2b$12$C/ZIa0h6IbTLG0aR1lkzCu0S26wbELjeNkFv/frObFmuVYrBPkgzO",
+        )
+    )
+    db_session.commit()
+
+    r = c.post(
+        "/token",
+        data={"username": login, "password": password, "grant_type": "password"},
+    )
+
+    assert r.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert r.json()["detail"] == apiMessages.server_busy
+
+
 def test_readuser_success(db_session):
     c = TestClient(app)
     userDB = User(
@@ -475,6 +517,63 @@ def test_edituser_success(db_session):
     assert data.created_at == expectedUser.created_at
 
 
+def test_readuser_cachedauth(db_session, query_budget):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+    c.get(
+        f"/user/{userDB.public_id}",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    # auth is served from the cache, only the read itself hits the database
+    with query_budget(1):
+        r = c.get(
+            f"/user/{userDB.public_id}",
+            headers={"Authorization": f"Bearer {token.access_token}"},
+        )
+
+    assert r.status_code == status.HTTP_200_OK
+    assert r.json()["username"] == login
+
+
+def test_edituser_invalidatesauthcache(db_session):
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+    toEdit = UserEdit(
+        id=userDB.public_id,
+        username=userDB.username,
+        email=userDB.email,
+        full_name=userDB.name,
+        password=password,
+        admin=userDB.admin,
+        disabled=True,
+    )
+
+    editR = c.post(
+        "/user/edit",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+        json=toEdit.model_dump(),
+    )
+    r = c.get(
+        f"/user/{userDB.public_id}",
+        headers={"Authorization": f"Bearer {token.access_token}"},
+    )
+
+    assert editR.status_code == status.HTTP_200_OK
+    assert r.status_code == status.HTTP_401_UNAUTHORIZED
+    assert r.json()["detail"] == apiMessages.inactive_user
+
+
 def test_edituser_usernotfound(db_session):
     c = TestClient(app)
     userDB = User(
@@ -600,3 +699,285 @@ def test_reportendpoint_success(db_session, mockMinIO, monkeypatch):
 
     assert reportR.status_code == 200
     assert resultR.json()["artifact_url"] is not None
+
+
+def test_reportendpoint_coalesced(db_session, monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        "app.api.routes_user.generate_report.apply_async",
+        lambda *args, **kwargs: queued.append(kwargs["args"]),
+    )
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    db_session.add(issueDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    def request_report() -> UserReport:
+        r = c.post(
+            "/user/report",
+            headers={
+                "Authorization": f"Bearer {token.access_token}",
+                "Idempotency-Key": uuid4().hex,
+            },
+        )
+        assert r.status_code == status.HTTP_200_OK
+        return UserReport(**r.json())
+
+    reports = [request_report() for _ in range(3)]
+
+    assert {report.id for report in reports} == {reports[0].id}
+    assert reports[0].status == JobState.QUEUED
+    assert len(queued) == 1
+
+    # Changed data is a different report
+    issueDB.title = "Edited title"
+    db_session.commit()
+    edited = request_report()
+
+    assert edited.id != reports[0].id
+    assert len(queued) == 2
+
+
+def test_reportendpoint_attachedretry(db_session, monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        "app.api.routes_user.generate_report.apply_async",
+        lambda *args, **kwargs: queued.append(kwargs["args"]),
+    )
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    issueDB = create_issue(projectDB, userDB, userDB)
+    db_session.add(issueDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    def request_report(idem_key: str) -> UserReport:
+        r = c.post(
+            "/user/report",
+            headers={
+                "Authorization": f"Bearer {token.access_token}",
+                "Idempotency-Key": idem_key,
+            },
+        )
+        assert r.status_code == status.HTTP_200_OK
+        return UserReport(**r.json())
+
+    first = request_report(uuid4().hex)
+    attachedKey = uuid4().hex
+    attached = request_report(attachedKey)
+    assert attached.id == first.id
+
+    # The request that attached is retried after the data changed
+    issueDB.title = "Edited title"
+    db_session.commit()
+    retried = request_report(attachedKey)
+
+    assert retried.id == first.id
+    assert len(queued) == 1
+
+
+def test_reportendpoint_stalerunning(db_session, monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        "app.api.routes_user.generate_report.apply_async",
+        lambda *args, **kwargs: queued.append(kwargs["args"]),
+    )
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    def request_report() -> UserReport:
+        r = c.post(
+            "/user/report",
+            headers={
+                "Authorization": f"Bearer {token.access_token}",
+                "Idempotency-Key": uuid4().hex,
+            },
+        )
+        assert r.status_code == status.HTTP_200_OK
+        return UserReport(**r.json())
+
+    first = request_report()
+    jobDB = db_session.execute(select(Job)).scalars().one()
+    jobDB.state = JobState.RUNNING
+    db_session.commit()
+
+    # A worker is still on it
+    assert request_report().id == first.id
+
+    # Its worker was lost long enough ago that the task won't come back
+    jobDB.updated_at = datetime.now() - timedelta(
+        seconds=settings.worker.visibility_timeout + 60
+    )
+    db_session.commit()
+    second = request_report()
+    db_session.refresh(jobDB)
+
+    assert second.id != first.id
+    assert second.status == JobState.QUEUED
+    assert jobDB.state == JobState.FAILED
+    assert jobDB.error_kind == "StaleJob"
+    assert jobDB.finished_at is not None
+    assert len(queued) == 2
+
+
+def test_reportendpoint_reusessucceeded(db_session, mockMinIO, monkeypatch):
+    monkeypatch.setattr(
+        "app.worker.tasks.create_session", lambda: db_session, raising=True
+    )
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    db_session.add(create_issue(projectDB, userDB, userDB))
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    reports = []
+    for _ in range(2):
+        r = c.post(
+            "/user/report",
+            headers={
+                "Authorization": f"Bearer {token.access_token}",
+                "Idempotency-Key": uuid4().hex,
+            },
+        )
+        reports.append(UserReport(**r.json()))
+    jobsDB = db_session.execute(select(Job)).scalars().all()
+
+    assert reports[1].id == reports[0].id
+    assert reports[1].status == JobState.SUCCEEDED
+    assert len(jobsDB) == 1
+
+
+@pytest.mark.parametrize(
+    "expiresIn", [timedelta(minutes=-1), timedelta(minutes=10), None]
+)
+def test_reportendpoint_expiredartifact(db_session, monkeypatch, expiresIn):
+    queued = []
+    monkeypatch.setattr(
+        "app.api.routes_user.generate_report.apply_async",
+        lambda *args, **kwargs: queued.append(kwargs["args"]),
+    )
+    c = TestClient(app)
+    login = "jdoetestuser"
+    password = "AAAAAAA"
+    userDB = create_user(username=login, password=password)
+    db_session.add(userDB)
+    db_session.commit()
+    token = get_test_token(c, login, password)
+
+    def request_report() -> UserReport:
+        r = c.post(
+            "/user/report",
+            headers={
+                "Authorization": f"Bearer {token.access_token}",
+                "Idempotency-Key": uuid4().hex,
+            },
+        )
+        return UserReport(**r.json())
+
+    first = request_report()
+    # Its presigned url has run out, is about to, or has no known expiry
+    jobDB = db_session.execute(select(Job)).scalars().one()
+    jobDB.state = JobState.SUCCEEDED
+    db_session.add(
+        create_artifact(
+            jobDB,
+            url="Mock.pdf",
+            expires_at=datetime.now() + expiresIn if expiresIn else None,
+        )
+    )
+    db_session.commit()
+    second = request_report()
+
+    assert second.id != first.id
+    assert second.status == JobState.QUEUED
+    assert len(queued) == 2
+
+
+def test_reportjob_unfinishedunique(db_session):
+    userDB = create_user()
+    db_session.add(userDB)
+    request_hash = uuid4().hex
+    db_session.add(create_job(userDB, request_hash=request_hash))
+    # Finished jobs don't take part in the index
+    db_session.add(create_job(userDB, request_hash=request_hash, state=JobState.FAILED))
+    db_session.commit()
+
+    db_session.add(create_job(userDB, request_hash=request_hash))
+    with pytest.raises(IntegrityError):
+        db_session.commit()
+    db_session.rollback()
+
+
+def test_queuereportjob_lostrace(db_session, monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        "app.api.routes_user.generate_report.apply_async",
+        lambda *args, **kwargs: queued.append(kwargs["args"]),
+    )
+    userDB = create_user()
+    db_session.add(userDB)
+    request_hash = uuid4().hex
+    db_session.add(create_job(userDB, request_hash=request_hash))
+    db_session.commit()
+
+    async def queue():
+        async with create_async_session() as session:
+            return await queue_report_job(session, userDB, uuid4().hex, request_hash)
+
+    # The concurrent request that got there first keeps the only unfinished job
+    assert asyncio.run(queue()) is None
+    assert queued == []
+
+
+def test_queuereportjob_preparedstatement(db_session, monkeypatch):
+    monkeypatch.setattr(
+        "app.api.routes_user.generate_report.apply_async", lambda *args, **kwargs: None
+    )
+    userDB = create_user()
+    db_session.add(userDB)
+    db_session.commit()
+    request_hash = uuid4().hex
+
+    async def queue_many():
+        # A pooled connection reuses the statement, psycopg prepares it after a few
+        # runs and Postgres may then plan it without the parameter values
+        engine = create_async_engine(settings.database.build_async_url())
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SET plan_cache_mode = force_generic_plan"))
+                await conn.commit()
+                async with AsyncSession(bind=conn, expire_on_commit=False) as session:
+                    return [
+                        await queue_report_job(
+                            session, userDB, uuid4().hex, request_hash
+                        )
+                        for _ in range(12)
+                    ]
+        finally:
+            await engine.dispose()
+
+    jobs = asyncio.run(queue_many())
+    assert jobs[0] is not None
+    assert jobs[1:] == [None] * 11
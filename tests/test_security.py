@@ -0,0 +1,101 @@
+import asyncio
+import threading
+
+import pytest
+
+import app.core.auth_cache as auth_cache
+import app.core.security as security
+from app.core.auth_cache import (
+    AuthPrincipal,
+    get_principal,
+    invalidate_user,
+    localCache,
+    redis_key,
+    set_principal,
+)
+from app.core.config import settings
+from app.core.errors import HashingBusyError
+from app.core.security import get_password_hash_async, verify_password_async
+
+from .conftest import FakeRedis
+
+
+def test_hashasync_success():
+    async def hash_and_verify():
+        passHash = await get_password_hash_async("secretTest")
+        return await verify_password_async("secretTest", passHash)
+
+    assert asyncio.run(hash_and_verify())
+
+
+def test_hashasync_poolfull(monkeypatch):
+    fullSlots = threading.BoundedSemaphore(1)
+    fullSlots.acquire()
+    monkeypatch.setattr(security, "hash_slots", fullSlots)
+
+    with pytest.raises(HashingBusyError):
+        asyncio.run(get_password_hash_async("secretTest"))
+
+
+def test_authcache_redisonly(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(settings.auth, "cacheRedis", True)
+    monkeypatch.setattr(auth_cache, "get_async_redis", lambda: redis)
+    principal = AuthPrincipal(
+        id=1, public_id="abc", username="jdoe", admin=False, disabled=False
+    )
+
+    async def cache_then_invalidate():
+        await set_principal("jdoe", "jti", principal)
+        cached = await get_principal("jdoe", "jti")
+        # Another process deleting the user only reaches the redis entry
+        del redis.data[redis_key("jdoe")]
+        return cached, await get_principal("jdoe", "jti")
+
+    cached, afterDelete = asyncio.run(cache_then_invalidate())
+
+    assert cached == principal
+    assert afterDelete is None
+    assert localCache.get(("jdoe", "jti")) is None
+
+
+def test_authcache_localinvalidation(monkeypatch):
+    monkeypatch.setattr(settings.auth, "cacheRedis", False)
+    principal = AuthPrincipal(
+        id=1, public_id="abc", username="jdoe", admin=False, disabled=False
+    )
+
+    async def cache_then_invalidate():
+        await set_principal("jdoe", "jti", principal)
+        cached = await get_principal("jdoe", "jti")
+        await invalidate_user("jdoe")
+        return cached, await get_principal("jdoe", "jti")
+
+    assert asyncio.run(cache_then_invalidate()) == (principal, None)
+
+
+def test_hashasync_cancelledkeepsslot(monkeypatch):
+    monkeypatch.setattr(security, "hash_slots", threading.BoundedSemaphore(1))
+    release = threading.Event()
+
+    def slow_hash(password):
+        release.wait(5)
+        return password
+
+    async def cancel_then_retry():
+        pending = asyncio.create_task(
+            security._run_hashing("hash", slow_hash, "secretTest")
+        )
+        await asyncio.sleep(0.05)
+        # The client went away but its hash still runs in the pool
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        with pytest.raises(HashingBusyError):
+            await security._run_hashing("hash", slow_hash, "secretTest")
+
+        release.set()
+        await asyncio.sleep(0.05)
+        return await security._run_hashing("hash", slow_hash, "secretTest")
+
+    assert asyncio.run(cancel_then_retry()) == "secretTest"
@@ -1,8 +1,11 @@
 from datetime import datetime
 from uuid import uuid4
 
+import pytest
+from celery.exceptions import Retry
 from fastapi.testclient import TestClient
 from sqlalchemy import insert, select
+from urllib3.exceptions import MaxRetryError
 
 from app.api.dto import UserReport
 from app.core.config import settings
@@ -34,3 +37,243 @@ def test_generatereport_success(db_session, mockMinIO, monkeypatch):
 
     assert jobDB.state == JobState.SUCCEEDED
     assert jobDB.result_kind == JobResultKind.ARTIFACT
+
+
+def test_generatereport_inmemorypdf(db_session, tmp_path, monkeypatch):
+    import app.worker.tasks as tasks
+
+    uploads = []
+
+    def _upload_bytes(data, file_extension, dest_folder_name, content_type, name):
+        uploads.append((data, file_extension, content_type))
+        return "Mock.pdf"
+
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    monkeypatch.setattr(tasks, "stored_url", lambda dest_path: None)
+    monkeypatch.setattr(tasks, "upload_bytes", _upload_bytes)
+    monkeypatch.chdir(tmp_path)
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    jobDB = create_job(userDB, job_type="generate-report", idempotency_key=uuid4().hex)
+    db_session.add(jobDB)
+    db_session.commit()
+
+    tasks.generate_report.delay(jobDB.public_id, userDB.public_id)
+    db_session.refresh(jobDB)
+
+    assert jobDB.state == JobState.SUCCEEDED
+    assert len(uploads) == 1
+    assert uploads[0][0].startswith(b"%PDF")
+    assert uploads[0][1:] == (".pdf", "application/pdf")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_generatereport_jobcounters(db_session, mockMinIO, monkeypatch):
+    import app.worker.tasks as tasks
+
+    transitions = []
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    monkeypatch.setattr(
+        tasks,
+        "job_state_changed",
+        lambda job_type, old, new: transitions.append((job_type, old, new)),
+    )
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    jobDB = create_job(userDB, job_type="generate-report", idempotency_key=uuid4().hex)
+    db_session.add(jobDB)
+    db_session.commit()
+
+    tasks.generate_report.delay(jobDB.public_id, userDB.public_id)
+
+    assert transitions == [
+        ("generate-report", JobState.QUEUED, JobState.RUNNING),
+        ("generate-report", JobState.RUNNING, JobState.SUCCEEDED),
+    ]
+
+
+def test_generatereport_publishesevents(db_session, mockMinIO, monkeypatch):
+    import app.worker.tasks as tasks
+
+    events = []
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    monkeypatch.setattr(
+        tasks,
+        "publish_job_event",
+        lambda public_id, state: events.append((public_id, state)),
+    )
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    jobDB = create_job(userDB, job_type="generate-report", idempotency_key=uuid4().hex)
+    db_session.add(jobDB)
+    db_session.commit()
+
+    tasks.generate_report.delay(jobDB.public_id, userDB.public_id)
+
+    assert events == [
+        (jobDB.public_id, JobState.RUNNING),
+        (jobDB.public_id, JobState.SUCCEEDED),
+    ]
+
+
+def test_generatereport_reusesstoredreport(db_session, monkeypatch):
+    import app.worker.tasks as tasks
+
+    lookups = []
+    uploads = []
+
+    def _stored_url(dest_path):
+        lookups.append(dest_path)
+        # The first report is built, the second one finds it
+        return None if not uploads else "Stored.pdf"
+
+    def _upload_bytes(data, file_extension, dest_folder_name, content_type, name):
+        uploads.append(name)
+        return "Mock.pdf"
+
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    monkeypatch.setattr(tasks, "stored_url", _stored_url)
+    monkeypatch.setattr(tasks, "upload_bytes", _upload_bytes)
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    projectDB = create_project(userDB)
+    db_session.add(projectDB)
+    db_session.add(create_issue(projectDB, userDB, userDB))
+    jobsDB = [create_job(userDB, job_type="generate-report") for _ in range(2)]
+    db_session.add_all(jobsDB)
+    db_session.commit()
+
+    for jobDB in jobsDB:
+        tasks.generate_report.delay(jobDB.public_id, userDB.public_id)
+        db_session.refresh(jobDB)
+
+    assert [jobDB.artifact.url for jobDB in jobsDB] == ["Mock.pdf", "Stored.pdf"]
+    assert len(uploads) == 1
+    assert lookups == [f"reports/{uploads[0]}.pdf"] * 2
+    assert uploads[0].startswith(f"{userDB.public_id}/")
+
+
+def test_reconcilejobcounts_success(db_session, monkeypatch):
+    import app.worker.tasks as tasks
+
+    written = []
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    monkeypatch.setattr(tasks, "write_job_counts", written.append)
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    db_session.add(create_job(userDB, state=JobState.SUCCEEDED))
+    db_session.add(create_job(userDB, state=JobState.SUCCEEDED))
+    db_session.add(create_job(userDB, state=JobState.FAILED))
+    db_session.add(create_job(userDB, job_type="export", state=JobState.FAILED))
+    db_session.commit()
+
+    tasks.reconcile_job_counts.delay()
+
+    assert written == [
+        {
+            JobState.QUEUED: {},
+            JobState.RUNNING: {},
+            JobState.SUCCEEDED: {"generate-report": 2},
+            JobState.FAILED: {"generate-report": 1, "export": 1},
+        }
+    ]
+
+
+def test_celeryapp_workersettings():
+    from app.worker.celery_app import app as celery_app
+    from app.worker.tasks import generate_report, reconcile_job_counts
+
+    assert generate_report.ignore_result == settings.worker.ignore_result
+    assert reconcile_job_counts.ignore_result
+    assert celery_app.conf.worker_prefetch_multiplier == (
+        settings.worker.prefetch_multiplier
+    )
+    assert celery_app.conf.task_acks_late == settings.worker.acks_late
+    assert celery_app.conf.broker_transport_options == {
+        "visibility_timeout": settings.worker.visibility_timeout
+    }
+
+
+def test_generatereport_skipsfinishedjob(db_session, monkeypatch):
+    import app.worker.tasks as tasks
+
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    # The failed job is delivered again after a newer one for the same input queued
+    failedDB = create_job(userDB, request_hash="abc", state=JobState.FAILED)
+    db_session.add_all([failedDB, create_job(userDB, request_hash="abc")])
+    db_session.commit()
+
+    tasks.generate_report.delay(failedDB.public_id, userDB.public_id)
+    db_session.refresh(failedDB)
+
+    assert failedDB.state == JobState.FAILED
+    assert failedDB.attempts == 0
+
+
+def test_generatereport_requeuesretries(db_session, monkeypatch):
+    import app.worker.tasks as tasks
+
+    states = []
+
+    def _stored_url(dest_path):
+        raise BlobError("bucket unreachable")
+
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    monkeypatch.setattr(tasks, "stored_url", _stored_url)
+    monkeypatch.setattr(
+        tasks,
+        "publish_job_event",
+        lambda public_id, state: states.append(state),
+    )
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    jobDB = create_job(userDB)
+    db_session.add(jobDB)
+    db_session.commit()
+
+    with pytest.raises(Retry):
+        tasks.generate_report.delay(jobDB.public_id, userDB.public_id)
+    db_session.refresh(jobDB)
+
+    # Waits for the retry as queued so a redelivery doesn't skip it
+    assert states == [JobState.RUNNING, JobState.QUEUED]
+    assert jobDB.state == JobState.QUEUED
+    assert jobDB.error_kind == "BlobError"
+
+    with pytest.raises(BlobError):
+        tasks.generate_report.apply(
+            args=[jobDB.public_id, userDB.public_id],
+            retries=tasks.generate_report.max_retries,
+        )
+    db_session.refresh(jobDB)
+
+    # Out of retries
+    assert states[2:] == [JobState.RUNNING, JobState.FAILED]
+    assert jobDB.attempts == 2
+    assert jobDB.finished_at is not None
+
+
+def test_generatereport_unexpectederror(db_session, monkeypatch):
+    import app.worker.tasks as tasks
+
+    def _stored_url(dest_path):
+        # What the minio client raises once it gives up on an unreachable server
+        raise MaxRetryError(None, dest_path)
+
+    monkeypatch.setattr(tasks, "create_session", lambda: db_session)
+    monkeypatch.setattr(tasks, "stored_url", _stored_url)
+    userDB = create_user(username="jdoetestuser", password="AAAAAAA")
+    db_session.add(userDB)
+    jobDB = create_job(userDB)
+    db_session.add(jobDB)
+    db_session.commit()
+
+    with pytest.raises(MaxRetryError):
+        tasks.generate_report.delay(jobDB.public_id, userDB.public_id)
+    db_session.refresh(jobDB)
+
+    assert jobDB.state == JobState.FAILED
+    assert jobDB.error_kind == "MaxRetryError"
+    assert jobDB.finished_at is not None